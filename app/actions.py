@@ -0,0 +1,223 @@
+"""Enter/leave actions and the bounded executor that runs them off the pipeline thread."""
+import json
+import logging
+import os
+import queue
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Action(ABC):
+    """Something to run on an event. run() blocks until it finishes and returns its exit code.
+
+    `started` must be called once the action is actually under way (process spawned,
+    request sent), so the executor can report launch latency separately from duration.
+    """
+
+    name = "action"
+
+    @abstractmethod
+    def run(self, context: dict, timeout: float, started: Callable[[], None]) -> int:
+        ...
+
+    def succeeded(self, code: int) -> bool:
+        return code == 0
+
+
+class ProcessAction(Action):
+    """A child process, killed after the timeout and always waited on so it never lingers as a zombie.
+
+    The event is passed as DOG_EVENT and DOG_CAMERA environment variables.
+    """
+
+    def __init__(self, argv: list[str], name: str | None = None):
+        self.argv = argv
+        self.name = name or " ".join(argv)
+
+    def run(self, context: dict, timeout: float, started: Callable[[], None]) -> int:
+        env = {**os.environ, "DOG_EVENT": context.get("event", ""), "DOG_CAMERA": context.get("camera", "")}
+        proc = subprocess.Popen(self.argv, env=env, stdin=subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        started()
+        try:
+            return proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            raise
+
+
+class WebhookAction(Action):
+    """POSTs the event as JSON; the "exit code" is the HTTP status."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.name = url
+
+    def run(self, context: dict, timeout: float, started: Callable[[], None]) -> int:
+        req = urllib.request.Request(self.url, data=json.dumps(context).encode(),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+        started()
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def succeeded(self, code: int) -> bool:
+        return 200 <= code < 300
+
+
+class CallbackAction(Action):
+    """An in-process function called with the event context. Timeouts can't interrupt it."""
+
+    def __init__(self, fn: Callable[[dict], object], name: str | None = None):
+        self.fn = fn
+        self.name = name or getattr(fn, "__name__", "callback")
+
+    def run(self, context: dict, timeout: float, started: Callable[[], None]) -> int:
+        started()
+        self.fn(context)
+        return 0
+
+
+def make_action(spec: str) -> Action:
+    """Action for a configured enter/leave script.
+
+    `spec` runs commands or makes requests as given, so it must only come from the
+    config file (see FILE_ONLY_FIELDS), never from a web request.
+
+    >>> make_action("http://127.0.0.1:8123/hook").name
+    'http://127.0.0.1:8123/hook'
+    >>> make_action("sh:say woof").argv
+    ['/bin/sh', '-c', 'say woof']
+    >>> make_action("~/scripts/lights.scpt").argv[0]
+    'osascript'
+    """
+    if spec.startswith(("http://", "https://")):
+        return WebhookAction(spec)
+    if spec.startswith("sh:"):
+        return ProcessAction(["/bin/sh", "-c", spec[3:]], name=spec)
+    return ProcessAction(["osascript", os.path.expanduser(spec)], name=spec)
+
+
+@dataclass
+class ActionResult:
+    name: str
+    ok: bool
+    code: int | None
+    launch_ms: float  # trigger until the action started: queue wait + spawn
+    duration_ms: float
+    error: str = ""
+
+
+class ActionExecutor:
+    """Runs actions on `workers` background threads, with at most `max_queue` waiting.
+
+    submit() never blocks: when the queue is full the action is dropped and counted.
+    Each run is bounded by `timeout`; its result goes to `on_result` and `recent`.
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 30.0, max_queue: int = 16,
+                 on_result: Callable[[ActionResult], None] = lambda _: None, name: str = "default"):
+        self.workers = workers
+        self.timeout = timeout
+        self.name = name
+        self._on_result = on_result
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._threads: list[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self.recent: deque[ActionResult] = deque(maxlen=20)
+        self._m_launch = metrics.histogram("action_launch_ms", "Trigger to action start (queue wait + spawn)",
+                                           camera=name)
+        self._m_duration = metrics.histogram("action_duration_ms", "Action run time", camera=name)
+        self._m_failed = metrics.counter("action_failures_total", "Actions that failed or timed out", camera=name)
+        self._m_dropped = metrics.counter("actions_dropped_total", "Actions dropped because the queue was full",
+                                          camera=name)
+
+    def submit(self, action: Action, context: dict) -> bool:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((action, context, time.perf_counter()))
+        except queue.Full:
+            self._m_dropped.inc()
+            logger.warning("Action queue full, dropped %s", action.name)
+            return False
+        return True
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if not self._threads:
+                self._threads = [
+                    threading.Thread(target=self._work, name=f"actions-{self.name}-{i}", daemon=True)
+                    for i in range(self.workers)
+                ]
+                for t in self._threads:
+                    t.start()
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._execute(*item)
+
+    def _execute(self, action: Action, context: dict, submitted: float):
+        launched = 0.0
+
+        def started():
+            nonlocal launched
+            launched = time.perf_counter()
+
+        code, error = None, ""
+        try:
+            code = action.run(context, self.timeout, started)
+        except subprocess.TimeoutExpired:
+            error = f"timed out after {self.timeout:g}s"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        end = time.perf_counter()
+        launched = launched or end
+        result = ActionResult(
+            name=action.name,
+            ok=not error and action.succeeded(code),
+            code=code,
+            launch_ms=(launched - submitted) * 1000,
+            duration_ms=(end - launched) * 1000,
+            error=error,
+        )
+        self._m_launch.observe(result.launch_ms)
+        self._m_duration.observe(result.duration_ms)
+        if not result.ok:
+            self._m_failed.inc()
+            logger.warning("Action %s failed: %s", action.name, error or f"exit {code}")
+        self.recent.append(result)
+        try:
+            self._on_result(result)
+        except Exception:
+            logger.exception("action result callback failed")
+
+    def close(self, timeout: float = 5.0):
+        """Stop the workers once queued actions have run (or `timeout` passes)."""
+        deadline = time.time() + timeout
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.time()))
+            except queue.Full:
+                break  # workers are daemon threads; give up waiting on a wedged queue
+        for t in self._threads:
+            t.join(max(0.0, deadline - time.time()))
+        self._threads = []
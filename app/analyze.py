@@ -0,0 +1,186 @@
+"""Run the detector and tracker over recorded footage and write an enter/leave timeline.
+
+    dog-detector-analyze clips/*.mp4 --stride 5 --set roi_points='[[0,0],[640,0],[640,360]]' --format csv
+
+Files are processed in parallel, one worker process per file at a time, each streamed
+frame by frame. Enter/leave hysteresis counts sampled frames, so with `--stride` the
+enter_frames/leave_frames thresholds cover stride times as many video frames. Times are
+positions in the footage, and scripts are never fired.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+from pathlib import Path
+
+from app.bench import parse_override
+from app.config import Config
+from app.detector import DogDetector, shift_detections
+from app.replay import IMAGE_SUFFIXES, iter_frames
+from app.roi import ROI
+from app.tracker import Tracker
+
+CSV_FIELDS = ("source", "time_s", "event", "dwell_s")
+
+_detector: DogDetector | None = None  # one per worker process, reused for every file it gets
+
+
+def _init_worker(config: Config, threads: int):
+    global _detector
+    _detector = DogDetector(model_name=config.model_name, confidence=config.confidence,
+                            backend=config.detector_backend, int8=config.model_int8, threads=threads)
+
+
+def analyze_file(source: str, config: Config, stride: int = 1) -> dict:
+    """Timeline of one video file or frame directory.
+
+    Each visit produces an "enter" and a "leave" carrying its dwell time; a visit still
+    open when the footage ends is closed by an "end" event.
+    """
+    roi = ROI()
+    if config.roi_points:
+        roi.set_points([tuple(p) for p in config.roi_points])
+    tracker = Tracker(enter_frames=config.enter_frames, leave_frames=config.leave_frames,
+                      min_overlap=config.min_overlap)
+    events = []
+    entered_at = None
+    frames = 0
+    ts = 0.0
+    t0 = time.perf_counter()
+    for ts, frame in iter_frames(source, stride=stride):
+        frames += 1
+        view, (dx, dy) = roi.crop(frame, config.roi_crop_padding) if config.roi_crop else (frame, (0, 0))
+        # detect_batch keeps IoU track IDs per source, so files never share tracks
+        detections = shift_detections(_detector.detect_batch([view], [source])[0], dx, dy)
+        entered, left = tracker.update(detections, roi)
+        if entered:
+            entered_at = ts
+            events.append({"source": source, "time_s": round(ts, 3), "event": "enter", "dwell_s": None})
+        if left and entered_at is not None:
+            events.append({"source": source, "time_s": round(ts, 3), "event": "leave",
+                           "dwell_s": round(ts - entered_at, 3)})
+            entered_at = None
+    if entered_at is not None:
+        events.append({"source": source, "time_s": round(ts, 3), "event": "end", "dwell_s": round(ts - entered_at, 3)})
+    return {
+        "source": source,
+        "frames": frames,
+        "duration_s": round(ts, 3),
+        "wall_s": round(time.perf_counter() - t0, 3),
+        "visits": sum(e["event"] == "enter" for e in events),
+        "dwell_s": round(sum(e["dwell_s"] or 0 for e in events), 3),
+        "events": events,
+    }
+
+
+def _expand(sources: list[str]) -> list[str]:
+    """Video files as given; directories of videos expand to their videos, frame directories stay whole."""
+    out = []
+    for s in sources:
+        path = Path(s)
+        if path.is_dir() and not any(p.suffix.lower() in IMAGE_SUFFIXES for p in path.iterdir()):
+            out.extend(str(p) for p in sorted(path.iterdir()) if p.is_file())
+        else:
+            out.append(s)
+    return out
+
+
+def run(sources: list[str], config: Config, stride: int = 1, workers: int = 0) -> dict:
+    """Analyze every source, `workers` files at a time (0 = one per core, at most one per file)."""
+    from app.backends import prepare_model, process_context
+
+    sources = _expand(sources)
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(sources)))
+    threads = config.inference_threads or max(1, cores // workers)
+    # export once here rather than racing to export in every worker
+    config.model_name = prepare_model(config.detector_backend, config.model_name, config.model_int8)
+
+    results: dict[str, dict] = {}
+    t0 = time.perf_counter()
+    if workers == 1:
+        _init_worker(config, threads)
+        for source in sources:
+            results[source] = _analyze_or_error(source, config, stride)
+            _progress(results[source])
+    else:
+        with ProcessPoolExecutor(workers, mp_context=process_context(), initializer=_init_worker,
+                                 initargs=(config, threads)) as pool:
+            futures = {pool.submit(_analyze_or_error, s, config, stride): s for s in sources}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                _progress(results[futures[future]])
+    return {
+        "stride": stride,
+        "workers": workers,
+        "wall_s": round(time.perf_counter() - t0, 3),
+        "files": [results[s] for s in sources],
+        "config": asdict(config),
+    }
+
+
+def _analyze_or_error(source: str, config: Config, stride: int) -> dict:
+    try:
+        return analyze_file(source, config, stride)
+    except Exception as e:  # a corrupt or odd file (cv2.error, ValueError...) must not end the whole run
+        return {"source": source, "error": f"{type(e).__name__}: {e}", "events": []}
+
+
+def _progress(result: dict):
+    if "error" in result:
+        print(f"{result['source']}: {result['error']}", file=sys.stderr)
+    else:
+        print(f"{result['source']}: {result['frames']} frames, {result['visits']} visits, "
+              f"{result['dwell_s']:.1f}s dwell in {result['wall_s']:.1f}s", file=sys.stderr)
+
+
+def write_csv(result: dict, out):
+    writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for f in result["files"]:
+        writer.writerows(f["events"])
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="dog-detector-analyze", description=__doc__.splitlines()[0])
+    parser.add_argument("sources", nargs="+", help="video files, directories of videos, or directories of frames")
+    parser.add_argument("--stride", type=int, default=1, help="infer every Nth frame (default: every frame)")
+    parser.add_argument("--workers", type=int, default=0, help="files analyzed in parallel (default: one per core)")
+    parser.add_argument("--set", dest="overrides", type=parse_override, action="append", default=[],
+                        metavar="FIELD=VALUE", help="override a config field (JSON value), repeatable")
+    parser.add_argument("--defaults", action="store_true", help="start from default config instead of the saved one")
+    parser.add_argument("--format", choices=("json", "csv"), default="json")
+    parser.add_argument("--output", "-o", metavar="PATH", default="-", help="where to write the timeline ('-' = stdout)")
+    args = parser.parse_args(argv)
+
+    config = Config() if args.defaults else Config.load()
+    for key, value in args.overrides:
+        setattr(config, key, value)
+    config.enter_script = config.leave_script = ""
+    config.cameras = []
+    if len(config.roi_points) < 3:
+        parser.error("no ROI to check against: save one from the web UI or pass --set roi_points=...")
+    try:
+        config.validate()
+    except ValueError as e:
+        parser.error(str(e))
+
+    result = run(args.sources, config, stride=max(1, args.stride), workers=args.workers)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        if args.format == "csv":
+            write_csv(result, out)
+        else:
+            json.dump(result, out, indent=2)
+            out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import logging
+import multiprocessing as mp
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+
+from app.config import CONFIG_DIR
+
+logger = logging.getLogger(__name__)
+
+MODEL_CACHE_DIR = CONFIG_DIR / "models"
+BACKENDS = ("ultralytics", "onnxruntime", "openvino")
+
+
+class Backend(ABC):
+    """Runs the model on a batch of BGR frames.
+
+    predict() returns one (N, 5) float array of x1, y1, x2, y2, confidence per frame,
+    containing dogs only, in that frame's pixel coordinates.
+    """
+
+    @abstractmethod
+    def predict(self, frames: list[np.ndarray], confidence: float) -> list[np.ndarray]:
+        ...
+
+
+def process_context() -> mp.context.BaseContext:
+    """Multiprocessing context for processes that load a backend.
+
+    Always spawn: a forked child inherits torch/BLAS thread pools in whatever state
+    the parent's threads left them, which can deadlock.
+    """
+    return mp.get_context("spawn")
+
+
+def load_backend(name: str, model_name: str, int8: bool = False, threads: int = 0) -> Backend:
+    """Instantiate a backend by name, importing its runtime only when selected."""
+    if name == "ultralytics":
+        from app.backends.yolo import YoloBackend
+        return YoloBackend(model_name, threads=threads)
+    if name == "onnxruntime":
+        from app.backends.onnx_runtime import OnnxBackend
+        return OnnxBackend(model_name, threads=threads)
+    if name == "openvino":
+        from app.backends.openvino_runtime import OpenVinoBackend
+        return OpenVinoBackend(model_name, int8=int8, threads=threads)
+    raise ValueError(f"unknown detector backend {name!r}, expected one of {BACKENDS}")
+
+
+def prepare_model(name: str, model_name: str, int8: bool = False) -> str:
+    """Model path `name` will load, exporting it first if needed.
+
+    Lets a parent process export once before spawning several workers.
+    """
+    if name == "onnxruntime" and not model_name.endswith(".onnx"):
+        return str(cached_export(model_name, "onnx"))
+    if name == "openvino" and not model_name.endswith("_openvino_model"):
+        return str(cached_export(model_name, "openvino", int8))
+    return model_name
+
+
+def cached_export(model_name: str, fmt: str, int8: bool = False) -> Path:
+    """Path of `model_name` exported to `fmt`, exporting into MODEL_CACHE_DIR on first use.
+
+    Exporting needs ultralytics (and torch) once; later runs only load the cached file.
+    """
+    stem = Path(model_name).stem + ("_int8" if int8 else "")
+    target = MODEL_CACHE_DIR / (f"{stem}.onnx" if fmt == "onnx" else f"{stem}_openvino_model")
+    if target.exists():
+        return target
+
+    from ultralytics import YOLO
+
+    logger.info("Exporting %s to %s (one-off)", model_name, fmt)
+    exported = YOLO(model_name).export(format=fmt, dynamic=True, int8=int8, verbose=False)
+    MODEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    shutil.move(str(exported), target)
+    return target
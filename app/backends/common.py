@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+from app.detector import DOG_CLASS_ID
+
+INPUT_SIZE = 640
+NMS_IOU = 0.45
+
+
+def letterbox(frame: np.ndarray, size: int = INPUT_SIZE) -> tuple[np.ndarray, float, tuple[int, int]]:
+    """Resize keeping aspect ratio and pad to size x size. Returns (image, scale, (pad_x, pad_y))."""
+    h, w = frame.shape[:2]
+    scale = min(size / h, size / w)
+    nh, nw = round(h * scale), round(w * scale)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    out = np.full((size, size, 3), 114, np.uint8)
+    out[top:top + nh, left:left + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return out, scale, (left, top)
+
+
+def to_blob(images: list[np.ndarray]) -> np.ndarray:
+    """Letterboxed BGR uint8 images → NCHW float32 RGB in [0, 1]."""
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+def decode_dogs(output: np.ndarray, confidence: float, scale: float, pad: tuple[int, int],
+                frame_shape: tuple[int, ...]) -> np.ndarray:
+    """One image's raw YOLOv8 head output (4 + classes, anchors) → (N, 5) dog boxes.
+
+    Only the dog class score is looked at, so NMS runs over dog candidates alone.
+    """
+    scores = output[4 + DOG_CLASS_ID]
+    keep = scores >= confidence
+    if not keep.any():
+        return np.zeros((0, 5), np.float32)
+    cx, cy, w, h = output[:4, keep]
+    scores = scores[keep]
+    x1 = (cx - w / 2 - pad[0]) / scale
+    y1 = (cy - h / 2 - pad[1]) / scale
+    bw, bh = w / scale, h / scale
+
+    idx = cv2.dnn.NMSBoxes(np.stack([x1, y1, bw, bh], axis=1).tolist(), scores.tolist(), confidence, NMS_IOU)
+    idx = np.asarray(idx, dtype=np.int64).reshape(-1)
+    fh, fw = frame_shape[:2]
+    boxes = np.stack([
+        np.clip(x1[idx], 0, fw), np.clip(y1[idx], 0, fh),
+        np.clip(x1[idx] + bw[idx], 0, fw), np.clip(y1[idx] + bh[idx], 0, fh),
+        scores[idx],
+    ], axis=1)
+    return boxes.astype(np.float32)
+
+
+def run_letterboxed(frames: list[np.ndarray], confidence: float, infer) -> list[np.ndarray]:
+    """Letterbox `frames`, call infer(blob) → (B, 4 + classes, anchors), decode dog boxes per frame."""
+    if not frames:
+        return []
+    boxed = [letterbox(f) for f in frames]
+    output = infer(to_blob([b[0] for b in boxed]))
+    return [decode_dogs(output[i], confidence, scale, pad, f.shape)
+            for i, (f, (_, scale, pad)) in enumerate(zip(frames, boxed))]
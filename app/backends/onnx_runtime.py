@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+
+from app.backends import Backend, cached_export
+from app.backends.common import run_letterboxed
+
+
+class OnnxBackend(Backend):
+    """YOLOv8 exported to ONNX, run on ONNX Runtime's CPU provider without torch."""
+
+    def __init__(self, model_name: str, threads: int = 0):
+        path = Path(model_name) if model_name.endswith(".onnx") else cached_export(model_name, "onnx")
+        opts = ort.SessionOptions()
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0].name
+
+    def predict(self, frames: list[np.ndarray], confidence: float) -> list[np.ndarray]:
+        return run_letterboxed(frames, confidence, lambda blob: self.session.run(None, {self._input: blob})[0])
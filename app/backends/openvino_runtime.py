@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import numpy as np
+import openvino as ov
+
+from app.backends import Backend, cached_export
+from app.backends.common import INPUT_SIZE, run_letterboxed
+
+
+class OpenVinoBackend(Backend):
+    """YOLOv8 exported to OpenVINO IR (optionally int8-quantized), compiled for CPU."""
+
+    def __init__(self, model_name: str, int8: bool = False, threads: int = 0):
+        path = Path(model_name) if model_name.endswith("_openvino_model") else cached_export(model_name, "openvino", int8)
+        core = ov.Core()
+        model = core.read_model(next(path.glob("*.xml")))
+        model.reshape({model.input(0): ov.PartialShape([-1, 3, INPUT_SIZE, INPUT_SIZE])})
+        config = {"INFERENCE_NUM_THREADS": threads} if threads else {}
+        self.compiled = core.compile_model(model, "CPU", config)
+
+    def predict(self, frames: list[np.ndarray], confidence: float) -> list[np.ndarray]:
+        return run_letterboxed(frames, confidence, lambda blob: self.compiled(blob)[0])
@@ -0,0 +1,29 @@
+import numpy as np
+from ultralytics import YOLO
+
+from app.backends import Backend
+from app.detector import DOG_CLASS_ID
+
+
+class YoloBackend(Backend):
+    """PyTorch ultralytics model. Also offers its built-in tracker for the single-camera path."""
+
+    def __init__(self, model_name: str, threads: int = 0):
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = YOLO(model_name)
+
+    def predict(self, frames: list[np.ndarray], confidence: float) -> list[np.ndarray]:
+        results = self.model.predict(frames, conf=confidence, classes=[DOG_CLASS_ID], verbose=False)
+        return [r.boxes.data[:, :5].cpu().numpy() for r in results]
+
+    def track(self, frame: np.ndarray, confidence: float) -> list[tuple[np.ndarray, int | None]]:
+        """Boxes with ultralytics track IDs, persisted across calls."""
+        results = self.model.track(frame, conf=confidence, classes=[DOG_CLASS_ID], persist=True, verbose=False)
+        tracked = []
+        for r in results:
+            for box in r.boxes:
+                row = np.array([*box.xyxy[0].tolist(), float(box.conf[0])])
+                tracked.append((row, int(box.id[0]) if box.id is not None else None))
+        return tracked
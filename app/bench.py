@@ -0,0 +1,164 @@
+"""Replay recorded footage through the pipeline at unlocked speed and report per-stage latency.
+
+    dog-detector-bench footage.mp4 --set inference_interval=3 --set confidence=0.5 --json out.json
+
+Frames are fed straight into Pipeline._process_frame, so the scheduler, motion gate,
+tracker and overlay behave as they do live; actions, clips and history are always off.
+"""
+import argparse
+import json
+import resource
+import sys
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from dataclasses import asdict
+
+import numpy as np
+
+from app.config import Config
+from app.pipeline import Pipeline
+from app.replay import iter_frames
+from app.state import AppState
+
+PERCENTILES = (50, 90, 99)
+STAGE_ORDER = ("detect", "track", "overlay", "jpeg", "frame")
+
+
+class StageTimer:
+    """Collects wall-clock samples (ms) per named stage."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.samples[name].append((time.perf_counter() - t0) * 1000)
+        return timed
+
+    def summary(self) -> dict:
+        out = {}
+        names = sorted(self.samples, key=lambda n: STAGE_ORDER.index(n) if n in STAGE_ORDER else len(STAGE_ORDER))
+        for name in names:
+            ms = np.asarray(self.samples[name])
+            stats = {"count": len(ms), "mean_ms": float(ms.mean()), "max_ms": float(ms.max())}
+            for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+                stats[f"p{p}_ms"] = float(v)
+            out[name] = stats
+        return out
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run(source: str, config: Config, max_frames: int = 0, encode: bool = True) -> dict:
+    # measure the pipeline alone: nothing fires, records clips or writes history during a replay
+    config.enter_script = config.leave_script = ""
+    config.record_clips = config.history = False
+    config.cameras = []
+    state = AppState()
+    pipeline = Pipeline(config, state)
+    pipeline._load_model()  # in the foreground: the benchmark measures steady state
+    if pipeline.detector is None:
+        raise RuntimeError(f"model failed to load: {state.model['error']}")
+
+    timer = StageTimer()
+    pipeline.detector.detect = timer.wrap("detect", pipeline.detector.detect)
+    pipeline.tracker.update = timer.wrap("track", pipeline.tracker.update)
+    pipeline.overlay.draw = timer.wrap("overlay", pipeline.overlay.draw)
+    process_frame = timer.wrap("frame", pipeline._process_frame)
+    encode_jpeg = timer.wrap("jpeg", state.frames.jpeg)
+
+    events = []
+    current = {"seq": 0, "ts": 0.0}
+    log_event = state.log_event
+
+    def record_event(msg: str):
+        if msg in ("DOG ENTERED", "DOG LEFT"):
+            events.append({"frame": current["seq"], "time_s": round(current["ts"], 3),
+                           "event": "enter" if msg == "DOG ENTERED" else "leave"})
+        log_event(msg)
+
+    state.log_event = record_event
+
+    t0 = time.perf_counter()
+    for seq, (ts, frame) in enumerate(iter_frames(source), start=1):
+        current["seq"], current["ts"] = seq, ts
+        process_frame(frame, seq)
+        if encode:
+            encode_jpeg()
+        if max_frames and seq >= max_frames:
+            break
+    wall_s = time.perf_counter() - t0
+
+    frames = current["seq"]
+    return {
+        "source": source,
+        "frames": frames,
+        "model_load_s": state.model["load_s"],
+        "inferences": state.inference_count,
+        "wall_s": wall_s,
+        "fps": frames / wall_s if wall_s > 0 else 0.0,
+        "stages": timer.summary(),
+        "peak_rss_mb": peak_rss_mb(),
+        "events": events,
+        "config": asdict(config),
+    }
+
+
+def parse_override(item: str) -> tuple[str, object]:
+    key, sep, raw = item.partition("=")
+    if not sep or key not in Config.__dataclass_fields__:
+        raise argparse.ArgumentTypeError(f"expected <config field>=<value>, got {item!r}")
+    try:
+        return key, json.loads(raw)
+    except json.JSONDecodeError:
+        return key, raw
+
+
+def _print_report(result: dict):
+    print(f"{result['source']}: {result['frames']} frames, {result['inferences']} inferences "
+          f"in {result['wall_s']:.2f}s ({result['fps']:.1f} fps), peak RSS {result['peak_rss_mb']:.0f} MB")
+    print(f"{'stage':<10}{'count':>8}{'mean':>9}" + "".join(f"{'p' + str(p):>9}" for p in PERCENTILES) + f"{'max':>9}")
+    for name, s in result["stages"].items():
+        row = f"{name:<10}{s['count']:>8}{s['mean_ms']:>9.2f}"
+        row += "".join(f"{s[f'p{p}_ms']:>9.2f}" for p in PERCENTILES)
+        print(row + f"{s['max_ms']:>9.2f}")
+    for e in result["events"]:
+        print(f"  {e['time_s']:>9.2f}s  frame {e['frame']:>6}  {e['event']}")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="dog-detector-bench", description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="video file or directory of frames")
+    parser.add_argument("--set", dest="overrides", type=parse_override, action="append", default=[],
+                        metavar="FIELD=VALUE", help="override a config field (JSON value), repeatable")
+    parser.add_argument("--defaults", action="store_true", help="start from default config instead of the saved one")
+    parser.add_argument("--max-frames", type=int, default=0)
+    parser.add_argument("--no-encode", action="store_true", help="skip the per-frame JPEG encode stage")
+    parser.add_argument("--json", metavar="PATH", help="also write the result as JSON ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    config = Config() if args.defaults else Config.load()
+    for key, value in args.overrides:
+        setattr(config, key, value)
+
+    result = run(args.source, config, max_frames=args.max_frames, encode=not args.no_encode)
+    if args.json == "-":
+        print(json.dumps(result, indent=2))
+        return
+    _print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
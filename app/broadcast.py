@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from app import metrics
+from app.framering import FrameRing
+from app.profiling import TRACER
+
+JPEG_QUALITY = 70
+
+
+class VersionSignal:
+    """Monotonic version counter that asyncio clients can await from any thread's bump()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = 0
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def bump(self, version: int | None = None):
+        with self._lock:
+            self.version = self.version + 1 if version is None else version
+            waiters, self._waiters = self._waiters, []
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_wake, fut)
+
+    async def wait_newer(self, after: int) -> int:
+        """Return the current version once it is greater than `after`."""
+        with self._lock:
+            if self.version > after:
+                return self.version
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+            self._waiters.append((loop, fut))
+        await fut
+        return self.version
+
+
+def _wake(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+
+PROFILE_IDLE_S = 30.0  # drop a profile's cached encode once no client has asked for it this long
+
+
+class _Profile:
+    """Cached encode for one (width, quality) pair."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jpeg: tuple[int, bytes] | None = None
+        self.scratch: np.ndarray | None = None  # reused resize target
+        self.last_used = 0.0
+
+
+class FrameBroadcaster:
+    """Holds the latest annotated frame and encodes it at most once per version and profile.
+
+    A profile is a max width (0 = full size) and a JPEG quality; each one a client asks
+    for is downscaled and encoded once per frame no matter how many clients share it,
+    and different profiles encode in parallel. publish() only stores a reference, so
+    with no viewers nothing is encoded. If frames come from `ring`, the broadcaster owns
+    the published reference: it releases a frame once it is replaced, and holds an
+    extra one while encoding so it can't be reused mid-encode.
+    """
+
+    def __init__(self, quality: int = JPEG_QUALITY):
+        self.quality = quality
+        self.signal = VersionSignal()
+        self._lock = threading.Lock()
+        self._frame: np.ndarray | None = None
+        self._version = 0
+        self._profiles: dict[tuple[int, int], _Profile] = {}
+        self.encodes = 0
+        self.ring: FrameRing | None = None
+        self.label = "default"  # camera name for frame traces
+
+    def publish(self, frame: np.ndarray, version: int):
+        with self._lock:
+            previous, self._frame = self._frame, frame
+            self._version = version
+        if self.ring is not None:
+            self.ring.release(previous)
+        self.signal.bump(version)
+
+    def _profile(self, key: tuple[int, int], now: float) -> _Profile:
+        profile = self._profiles.get(key)
+        if profile is None:
+            for stale in [k for k, p in self._profiles.items() if now - p.last_used > PROFILE_IDLE_S]:
+                del self._profiles[stale]
+            profile = self._profiles[key] = _Profile()
+        profile.last_used = now
+        return profile
+
+    def jpeg(self, width: int = 0, quality: int | None = None) -> tuple[int, bytes] | None:
+        """(version, jpeg) for the latest frame at most `width` wide, encoding it if no one has yet."""
+        quality = quality or self.quality
+        with self._lock:
+            frame, version = self._frame, self._version
+            if frame is None:
+                return None
+            if width >= frame.shape[1]:
+                width = 0
+            profile = self._profile((width, quality), time.monotonic())
+            cached = profile.jpeg
+            if cached is not None and cached[0] >= version:
+                return cached
+            if self.ring is not None:
+                self.ring.retain(frame)
+        try:
+            with profile.lock:
+                cached = profile.jpeg
+                if cached is not None and cached[0] >= version:
+                    return cached  # another client encoded it while we waited
+                t0 = time.perf_counter()
+                # a frame's spans may already be evicted; never let a re-encode push out newer frames
+                with TRACER.span(f"jpeg {width or 'full'}@{quality}", self.label, version, create=False):
+                    image = frame
+                    if width:
+                        h = max(1, round(frame.shape[0] * width / frame.shape[1]))
+                        if profile.scratch is None or profile.scratch.shape[:2] != (h, width):
+                            profile.scratch = np.empty((h, width, frame.shape[2]), frame.dtype)
+                        image = cv2.resize(frame, (width, h), dst=profile.scratch, interpolation=cv2.INTER_AREA)
+                    _, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                metrics.histogram("jpeg_encode_ms", "JPEG encode time per streamed frame").observe(
+                    (time.perf_counter() - t0) * 1000)
+                profile.jpeg = (version, buf.tobytes())
+                self.encodes += 1
+                return profile.jpeg
+        finally:
+            if self.ring is not None:
+                self.ring.release(frame)
+
+    async def next_jpeg(self, after: int, width: int = 0, quality: int | None = None) -> tuple[int, bytes] | None:
+        """Wait for a frame newer than `after` and return it encoded, off the event loop."""
+        await self.signal.wait_newer(after)
+        return await asyncio.to_thread(self.jpeg, width, quality)
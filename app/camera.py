@@ -1,56 +1,277 @@
+import argparse
 import logging
+import os
 import threading
 import time
 from collections.abc import Callable
+from dataclasses import asdict, dataclass
 
 import cv2
 import numpy as np
 
+from app import metrics
+from app.framering import FrameRing
+
 logger = logging.getLogger(__name__)
 
-MAX_RECONNECTS = 5
-RECONNECT_DELAY_S = 2.0
+# reconnect backoff doubles from the first delay up to the cap and never gives up
+RECONNECT_DELAY_S = 0.5
+RECONNECT_MAX_DELAY_S = 30.0
+DEVICE_RETRY_S = 0.01
+
+# OPENCV_FFMPEG_CAPTURE_OPTIONS is process-wide and read while a capture opens, so
+# cameras with different options open one at a time
+_OPEN_LOCK = threading.Lock()
+
+
+class FrameMailbox:
+    """Single-slot handoff between capture and inference: newest frame wins.
+
+    >>> box = FrameMailbox()
+    >>> box.put("a"), box.put("b")
+    (None, 'a')
+    >>> box.get(timeout=0)
+    (2, 'b')
+    >>> box.dropped
+    1
+    >>> box.get(timeout=0) is None
+    True
+    """
+
+    def __init__(self, cond: threading.Condition | None = None):
+        # several mailboxes may share one condition so a consumer can wait on all of them
+        self._cond = cond if cond is not None else threading.Condition()
+        self._frame: np.ndarray | None = None
+        self._seq = 0
+        self._put_at = 0.0
+        self.dropped = 0
+        self.lag_ms = 0.0  # how long the last taken frame waited in the slot
+
+    def put(self, frame: np.ndarray) -> np.ndarray | None:
+        """Store `frame`; returns the frame it replaced if that one was never consumed."""
+        with self._cond:
+            dropped = self._frame
+            if dropped is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._put_at = time.time()
+            self._seq += 1
+            self._cond.notify_all()
+            return dropped
+
+    @property
+    def ready(self) -> bool:
+        return self._frame is not None
+
+    def get(self, timeout: float | None = None) -> tuple[int, np.ndarray] | None:
+        """Take the newest frame as (seq, frame), or None if none arrived within timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frame is not None, timeout):
+                return None
+            frame, self._frame = self._frame, None
+            self.lag_ms = (time.time() - self._put_at) * 1000
+            return self._seq, frame
+
+
+@dataclass
+class StreamHealth:
+    """Capture-side view of a stream, updated by CameraThread once a second."""
+    connected: bool = False
+    grab_fps: float = 0.0
+    decode_fps: float = 0.0
+    skipped: int = 0  # grabbed but never decoded
+    reconnects: int = 0
+    lag_ms: float = 0.0  # set by the consumer: how stale the newest frame was when taken
+    last_frame: float = 0.0
+
+    def as_dict(self) -> dict:
+        d = asdict(self)
+        last = d.pop("last_frame")
+        d["frame_age_s"] = round(time.time() - last, 2) if last else None
+        return d
 
 
 class CameraThread:
-    def __init__(self, source: str | int = 0, on_frame: Callable[[np.ndarray], None] = lambda _: None):
+    """Reads frames on a daemon thread and hands each to `on_frame`.
+
+    Frames are grab()bed continuously so the stream never backs up, but only retrieve()d
+    (colour-converted and copied out) when `want_frame()` says the consumer will use one
+    and `max_fps` allows; the rest are skipped. Read failures on a source given as a
+    string (a URL, device path or GStreamer pipeline) reopen it with exponential backoff
+    forever; `on_status` hears when the stream is lost and restored. A video file ends
+    at EOF, and a device index is retried in place without reopening.
+
+    With `buffers`, frames are decoded straight into ring buffers instead of fresh
+    arrays; `on_frame` then owns one reference and must release it when done.
+    """
+
+    def __init__(self, source: str | int = 0, on_frame: Callable[[np.ndarray], None] = lambda _: None,
+                 name: str = "default", buffers: FrameRing | None = None,
+                 want_frame: Callable[[], bool] | None = None, max_fps: float = 0.0,
+                 backend: str = "", buffer_size: int = 0, timeout_ms: int = 0, options: dict | None = None,
+                 on_status: Callable[[str], None] = lambda _: None):
         self.source = source
+        self.name = name
+        self.buffers = buffers
+        self.want_frame = want_frame
+        self.max_fps = max_fps
+        if backend and not hasattr(cv2, f"CAP_{backend.upper()}"):
+            raise ValueError(f"unknown capture backend {backend!r}")
+        self.backend = backend
+        self.buffer_size = buffer_size
+        self.timeout_ms = timeout_ms
+        self.options = options or {}
+        self.health = StreamHealth()
         self._on_frame = on_frame
+        self._on_status = on_status
         self._running = False
-        self._is_network = isinstance(source, str)
+        self._stop = threading.Event()
+        # only a real file ends; URLs, device paths and GStreamer pipelines reconnect
+        self._is_file = isinstance(source, str) and "://" not in source and os.path.isfile(source)
+        self._is_network = isinstance(source, str) and not self._is_file
         self._thread: threading.Thread | None = None
 
     def _open(self) -> cv2.VideoCapture:
-        cap = cv2.VideoCapture(self.source)
-        if not self._is_network:
+        api = getattr(cv2, f"CAP_{self.backend.upper()}") if self.backend else cv2.CAP_ANY
+        params = []
+        if self.timeout_ms:
+            params = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, self.timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, self.timeout_ms]
+        with _OPEN_LOCK:
+            previous = os.environ.pop("OPENCV_FFMPEG_CAPTURE_OPTIONS", None)
+            if self.options:
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "|".join(f"{k};{v}" for k, v in self.options.items())
+            try:
+                cap = cv2.VideoCapture(self.source, api, params)
+            finally:
+                os.environ.pop("OPENCV_FFMPEG_CAPTURE_OPTIONS", None)
+                if previous is not None:
+                    os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = previous
+        if self.buffer_size:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        if not self._is_network and not self._is_file:
             cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
             cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
         return cap
 
+    def _wanted(self, now: float, last_decode: float) -> bool:
+        if self.max_fps and now - last_decode < 1.0 / self.max_fps:
+            return False
+        return self.want_frame is None or self.want_frame()
+
     def _run(self):
+        grab_ms = metrics.histogram("capture_ms", "Time blocked in cap.grab()", camera=self.name)
+        read_failures = metrics.counter("capture_failures_total", "Failed frame reads", camera=self.name)
+        reconnects = metrics.counter("camera_reconnects_total", "Stream reconnect attempts", camera=self.name)
+        grabbed_total = metrics.counter("frames_grabbed_total", "Frames pulled from the stream", camera=self.name)
+        decoded_total = metrics.counter("frames_decoded_total", "Frames retrieved for the pipeline", camera=self.name)
+        health = self.health
         cap = self._open()
         failures = 0
+        shape = None  # the ring is sized from the first decoded frame
+        last_decode = 0.0
+        window_start, grabbed, decoded = time.perf_counter(), 0, 0
         while self._running:
-            ret, frame = cap.read()
+            t0 = time.perf_counter()
+            ret = cap.grab()
             if ret:
+                grab_ms.observe((time.perf_counter() - t0) * 1000)
+                grabbed += 1
+                grabbed_total.inc()
+                if not self._wanted(t0, last_decode):
+                    health.skipped += 1
+                    frame = None
+                else:
+                    buf = self.buffers.acquire(shape) if self.buffers is not None and shape is not None else None
+                    ret, frame = cap.retrieve(buf) if buf is not None else cap.retrieve()
+                    if buf is not None and (not ret or frame is not buf):
+                        # retrieve failed or the resolution changed and OpenCV allocated a new array
+                        self.buffers.release(buf)
+            if ret:
+                if failures:
+                    self._on_status(f"Camera stream restored after {failures} attempt(s)")
                 failures = 0
-                self._on_frame(frame)
-            elif self._is_network and failures < MAX_RECONNECTS:
+                health.connected = True
+                if frame is not None:
+                    shape = frame.shape
+                    last_decode = t0
+                    decoded += 1
+                    decoded_total.inc()
+                    health.last_frame = time.time()
+                    self._on_frame(frame)
+            elif self._is_file:
+                # end of a video file: the stream is over, not lost
+                health.connected = False
+                health.grab_fps = health.decode_fps = 0.0
+                logger.info("Video file %s ended", self.source)
+                self._on_status("Video file ended")
+                break
+            elif not self._is_network:
+                # a local device hiccup: retry in place, like before reconnects existed
+                read_failures.inc()
+                if self._stop.wait(DEVICE_RETRY_S):
+                    break
+            else:
+                read_failures.inc()
+                health.connected = False
+                health.grab_fps = health.decode_fps = 0.0
+                if not failures:
+                    self._on_status("Camera stream lost, reconnecting")
+                delay = min(RECONNECT_MAX_DELAY_S, RECONNECT_DELAY_S * 2 ** failures)
                 failures += 1
-                logger.warning("Stream read failed, reconnecting (%d/%d)", failures, MAX_RECONNECTS)
+                logger.warning("Stream read failed, reconnecting in %.1fs (attempt %d)", delay, failures)
                 cap.release()
-                time.sleep(RECONNECT_DELAY_S)
+                if self._stop.wait(delay):
+                    break
+                reconnects.inc()
+                health.reconnects += 1
                 cap = self._open()
-            else:
-                time.sleep(0.01)
+
+            now = time.perf_counter()
+            if now - window_start >= 1.0:
+                health.grab_fps = grabbed / (now - window_start)
+                health.decode_fps = decoded / (now - window_start)
+                window_start, grabbed, decoded = now, 0, 0
         cap.release()
 
     def start(self):
         self._running = True
-        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.name}", daemon=True)
         self._thread.start()
 
     def stop(self):
         self._running = False
+        self._stop.set()
         if self._thread is not None:
             self._thread.join(timeout=5.0)
+
+
+def main():
+    """Print stream health once a second; handy against a file or a local RTSP server."""
+    parser = argparse.ArgumentParser(description="Probe a capture source")
+    parser.add_argument("source", help="device index, file path or stream URL")
+    parser.add_argument("--max-fps", type=float, default=0.0, help="decode at most this many frames/s")
+    parser.add_argument("--backend", default="", help="OpenCV capture backend, e.g. ffmpeg or gstreamer")
+    parser.add_argument("--buffer-size", type=int, default=0)
+    parser.add_argument("--timeout-ms", type=int, default=0)
+    parser.add_argument("--tcp", action="store_true", help="force RTSP over TCP (FFmpeg backend)")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    cam = CameraThread(source, max_fps=args.max_fps, backend=args.backend, buffer_size=args.buffer_size,
+                       timeout_ms=args.timeout_ms, options={"rtsp_transport": "tcp"} if args.tcp else None,
+                       on_status=print)
+    cam.start()
+    try:
+        end = time.time() + args.seconds
+        while time.time() < end:
+            time.sleep(1.0)
+            print(cam.health.as_dict())
+    finally:
+        cam.stop()
+
+
+if __name__ == "__main__":
+    main()
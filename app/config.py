@@ -1,24 +1,191 @@
 import json
-from dataclasses import asdict, dataclass, field
+from dataclasses import MISSING, asdict, dataclass, field, fields, replace
 from pathlib import Path
 
 CONFIG_DIR = Path.home() / ".config" / "dog-detector"
 CONFIG_PATH = CONFIG_DIR / "config.json"
 
+# fields a running pipeline applies between frames; any other change needs a restart
+LIVE_FIELDS = frozenset({
+    "roi_points", "enter_script", "leave_script", "action_timeout", "confidence", "cooldown",
+    "enter_frames", "leave_frames", "min_overlap", "roi_crop", "roi_crop_padding", "history_sample_s",
+    "inference_interval", "adaptive_interval", "inference_budget", "min_inference_interval",
+    "max_inference_interval", "idle_after",
+    "detection_cache", "cache_distance", "cache_max_age",
+    "motion_gate", "motion_threshold", "motion_max_skip", "motion_roi_only", "motion_roi_margin",
+    "motion_prediction", "prediction_max_s",
+})
+# fields only the config file may set, never the web API: they name commands to run,
+# URLs to fetch, paths to write, or the web token itself
+FILE_ONLY_FIELDS = frozenset({
+    "enter_script", "leave_script", "camera_device", "capture_backend", "capture_options",
+    "model_name", "clip_dir", "history_path", "web_token", "cameras",
+})
+# (field, low, high) inclusive bounds checked by Config.validate()
+_RANGES = (
+    ("confidence", 0.0, 1.0), ("min_overlap", 0.0, 1.0), ("inference_budget", 0.0, 1.0),
+    ("motion_threshold", 0.0, 1.0), ("cooldown", 0.0, None), ("action_timeout", 0.0, None),
+    ("enter_frames", 1, None), ("leave_frames", 1, None), ("inference_interval", 1, None),
+    ("min_inference_interval", 1, None), ("max_inference_interval", 1, None), ("prediction_max_s", 0.0, None),
+    ("history_retention_days", 0.0, None),
+)
+
 
 @dataclass
 class Config:
     roi_points: list[list[int]] = field(default_factory=list)
+    # enter/leave actions: an AppleScript path (run with osascript), "sh:<command>", or an
+    # http(s):// URL that is POSTed the event as JSON; settable in the config file only
     enter_script: str = ""
     leave_script: str = ""
+    # actions run on action_workers background threads, are killed after action_timeout
+    # seconds, and are dropped when action_queue of them are already waiting
+    action_workers: int = 2
+    action_timeout: float = 30.0
+    action_queue: int = 16
     camera_device: str | int = 0
+    # capture_skip decodes a frame only when the pipeline is ready to take it, and
+    # capture_max_fps (0 = no limit) caps decodes; other frames are grabbed and discarded
+    capture_skip: bool = False
+    capture_max_fps: float = 0.0
+    # passed to cv2.VideoCapture: backend ("ffmpeg", "gstreamer", ...; "" = auto),
+    # CAP_PROP_BUFFERSIZE (0 = driver default), open/read timeout and FFmpeg options
+    # such as {"rtsp_transport": "tcp"}
+    capture_backend: str = ""
+    capture_buffer_size: int = 0
+    capture_timeout_ms: int = 0
+    capture_options: dict = field(default_factory=dict)
+    # "ultralytics" (torch), "onnxruntime" or "openvino"; non-torch backends export
+    # model_name once and load the cached export afterwards
+    detector_backend: str = "ultralytics"
+    model_name: str = "yolov8n.pt"
+    model_int8: bool = False
+    # >0 runs detection in that many worker processes (single camera only);
+    # inference_threads caps intra-op threads per detector (0 = runtime default,
+    # or cores / workers in process mode)
+    inference_workers: int = 0
+    inference_threads: int = 0
     inference_interval: int = 5
+    # adapt the interval to inference_budget (fraction of wall time spent inferring)
+    # and tracker activity, between min_ and max_inference_interval
+    adaptive_interval: bool = False
+    inference_budget: float = 0.5
+    min_inference_interval: int = 1
+    max_inference_interval: int = 15
+    idle_after: float = 30.0
     confidence: float = 0.4
     cooldown: float = 5.0
     web_port: int = 8000
+    # required (as an X-Token header) for web API writes and admin endpoints; without
+    # one they are only accepted from this machine, not through a proxy or tunnel
+    web_token: str = ""
+    # draw boxes and the ROI on the server (true) or stream raw frames and leave the
+    # overlay to the dashboard, which draws it from per-frame metadata (false); clips
+    # are recorded without the overlay then
+    server_overlay: bool = True
     enter_frames: int = 3
     leave_frames: int = 5
     min_overlap: float = 0.5
+    # run the detector only on the ROI's bounding rectangle plus padding
+    roi_crop: bool = False
+    roi_crop_padding: int = 64
+    # reuse the last detections while the ROI region looks unchanged (mean grey-level
+    # distance of a 32x18 thumbnail), for at most cache_max_age seconds
+    detection_cache: bool = False
+    cache_distance: float = 3.0
+    cache_max_age: float = 10.0
+    # skip scheduled inference when nothing moved since the last inferred frame
+    motion_gate: bool = False
+    motion_threshold: float = 0.01
+    motion_max_skip: int = 10
+    motion_roi_only: bool = True
+    motion_roi_margin: int = 40
+    # on frames that aren't inferred, move each tracked box along its velocity
+    # (estimated over the last inferences) for at most prediction_max_s seconds;
+    # off by default so the overlay shows only boxes the model actually found
+    motion_prediction: bool = False
+    prediction_max_s: float = 1.0
+    # save an MP4 around each enter/leave: clip_pre_roll seconds before the event and
+    # clip_post_roll after, sampled at clip_fps; the oldest clips are deleted once
+    # clip_dir ("" = ~/.config/dog-detector/clips) exceeds clip_quota_mb
+    record_clips: bool = False
+    clip_dir: str = ""
+    clip_pre_roll: float = 5.0
+    clip_post_roll: float = 5.0
+    clip_fps: float = 10.0
+    clip_quality: int = 80
+    clip_quota_mb: float = 500.0
+    # keep enter/leave events, script fires and detections (sampled every
+    # history_sample_s) in SQLite at history_path ("" = ~/.config/dog-detector/history.db),
+    # deleting rows older than history_retention_days (0 = forever)
+    history: bool = False
+    history_path: str = ""
+    history_sample_s: float = 1.0
+    history_retention_days: float = 30.0
+    # multi-camera mode: each entry needs a "name" and may override any field above
+    cameras: list[dict] = field(default_factory=list)
+
+    def camera_names(self) -> list[str]:
+        return [c["name"] for c in self.cameras]
+
+    def _camera_entry(self, name: str) -> dict:
+        for c in self.cameras:
+            if c["name"] == name:
+                return c
+        raise KeyError(name)
+
+    def for_camera(self, name: str | None) -> "Config":
+        """Effective config for one camera; None means the top-level single camera."""
+        if name is None:
+            return self
+        overrides = {k: v for k, v in self._camera_entry(name).items()
+                     if k in self.__dataclass_fields__ and k != "cameras"}
+        return replace(self, cameras=[], **overrides)
+
+    def update_camera(self, name: str | None, **fields):
+        if name is None:
+            for k, v in fields.items():
+                setattr(self, k, v)
+        else:
+            self._camera_entry(name).update(fields)
+
+    def validate(self):
+        """Raise ValueError if a field has the wrong type or is out of range.
+
+        >>> Config(confidence=0.6, enter_frames=2).validate()
+        >>> Config(confidence=1.5).validate()
+        Traceback (most recent call last):
+        ...
+        ValueError: confidence must be between 0.0 and 1.0
+        >>> Config(enter_frames="3").validate()
+        Traceback (most recent call last):
+        ...
+        ValueError: enter_frames must be int, not str
+        >>> Config(roi_points=[1, 2, 3]).validate()
+        Traceback (most recent call last):
+        ...
+        ValueError: roi_points must be empty or at least 3 [x, y] integer pairs
+        """
+        for f in fields(self):
+            default = f.default if f.default is not MISSING else f.default_factory()
+            value = getattr(self, f.name)
+            if f.name == "camera_device":
+                expected = (int, str)
+            else:
+                expected = (int, float) if type(default) is float else (type(default),)
+            if not isinstance(value, expected) or (type(value) is bool and bool not in expected):
+                raise ValueError(f"{f.name} must be {type(default).__name__}, not {type(value).__name__}")
+        for name, low, high in _RANGES:
+            value = getattr(self, name)
+            if value < low or (high is not None and value > high):
+                bound = f"between {low} and {high}" if high is not None else f"at least {low}"
+                raise ValueError(f"{name} must be {bound}")
+        if self.min_inference_interval > self.max_inference_interval:
+            raise ValueError("min_inference_interval must not exceed max_inference_interval")
+        if self.roi_points and (len(self.roi_points) < 3 or not all(
+                isinstance(p, (list, tuple)) and len(p) == 2 and all(type(c) is int for c in p)
+                for p in self.roi_points)):
+            raise ValueError("roi_points must be empty or at least 3 [x, y] integer pairs")
 
     def save(self):
         CONFIG_DIR.mkdir(parents=True, exist_ok=True)
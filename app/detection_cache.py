@@ -0,0 +1,76 @@
+import time
+from dataclasses import replace
+
+import cv2
+import numpy as np
+
+from app.detector import Detection
+from app.roi import ROI
+
+FINGERPRINT_SIZE = (32, 18)  # width, height
+
+
+class DetectionCache:
+    """Reuses the last inferred detections while the frame still looks the same.
+
+    The fingerprint is a tiny greyscale thumbnail of the ROI's bounding rect (or the
+    whole frame without a valid ROI); the distance is the mean absolute grey-level
+    difference to the fingerprint of the last inferred frame. Entries older than
+    `max_age` seconds always miss, so the tracker is refreshed by a real inference.
+
+    >>> cache = DetectionCache(max_distance=2.0, max_age=60)
+    >>> frame = np.full((90, 160, 3), 100, np.uint8)
+    >>> cached, token = cache.lookup(frame, ROI())
+    >>> cached is None
+    True
+    >>> cache.store(token, [Detection(bbox=(1, 2, 3, 4), center=(2, 3), confidence=0.9, track_id=7)])
+    >>> [d.track_id for d in cache.lookup(frame + 1, ROI())[0]]
+    [7]
+    >>> cache.lookup(frame + 50, ROI())[0] is None
+    True
+    >>> cache.hits, cache.misses
+    (1, 2)
+    """
+
+    def __init__(self, max_distance: float = 3.0, max_age: float = 10.0):
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._fingerprint: np.ndarray | None = None
+        self._detections: list[Detection] = []
+        self._stored_at = 0.0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def lookup(self, frame: np.ndarray, roi: ROI) -> tuple[list[Detection] | None, np.ndarray]:
+        """(cached detections as fresh copies, or None on a miss; `frame`'s fingerprint).
+
+        Pass the fingerprint to store() with the detections inferred for that frame.
+        """
+        fp = _fingerprint(frame, roi)
+        if (self._fingerprint is not None and fp.shape == self._fingerprint.shape
+                and time.time() - self._stored_at < self.max_age
+                and np.abs(fp - self._fingerprint).mean() <= self.max_distance):
+            self.hits += 1
+            return [replace(d) for d in self._detections], fp
+        self.misses += 1
+        return None, fp
+
+    def store(self, fingerprint: np.ndarray, detections: list[Detection]):
+        """Remember the detections inferred for the frame lookup() gave `fingerprint`."""
+        self._fingerprint = fingerprint
+        self._detections = [replace(d) for d in detections]
+        self._stored_at = time.time()
+
+
+def _fingerprint(frame: np.ndarray, roi: ROI) -> np.ndarray:
+    rect = roi.bounding_rect(0, frame.shape)
+    if rect is not None:
+        x1, y1, x2, y2 = rect
+        frame = frame[y1:y2, x1:x2]
+    small = cv2.resize(frame, FINGERPRINT_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
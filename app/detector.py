@@ -1,9 +1,12 @@
 from dataclasses import dataclass
 
 import numpy as np
-from ultralytics import YOLO
+
+from app.backends import load_backend
+from app.iou_tracker import IouTracker
 
 DOG_CLASS_ID = 16
+WARMUP_SHAPE = (480, 640, 3)
 
 
 @dataclass
@@ -15,25 +18,69 @@ class Detection:
     in_roi: bool = False
 
 
+def shift_detections(detections: list[Detection], dx: int, dy: int) -> list[Detection]:
+    """Move detections found in a crop back into full-frame coordinates (in place)."""
+    if dx == 0 and dy == 0:
+        return detections
+    for d in detections:
+        x1, y1, x2, y2 = d.bbox
+        d.bbox = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+        d.center = (d.center[0] + dx, d.center[1] + dy)
+    return detections
+
+
+def _detection(row: np.ndarray, track_id: int | None) -> Detection:
+    x1, y1, x2, y2 = map(int, row[:4])
+    return Detection(
+        bbox=(x1, y1, x2, y2),
+        center=((x1 + x2) // 2, (y1 + y2) // 2),
+        confidence=float(row[4]),
+        track_id=track_id,
+    )
+
+
+def track_boxes(tracker: IouTracker, boxes: np.ndarray) -> list[Detection]:
+    """Turn one frame's (N, 5) backend boxes into Detections with IDs from `tracker`."""
+    return [_detection(row, tid) for row, tid in zip(boxes, tracker.update(boxes))]
+
+
 class DogDetector:
-    def __init__(self, model_name: str = "yolov8n.pt", confidence: float = 0.4):
-        self.model = YOLO(model_name)
+    """Detects dogs with a pluggable backend and assigns track IDs.
+
+    Backends only return boxes; IDs come from a per-stream IouTracker, except that
+    the ultralytics backend keeps using its own tracker for single-frame detect().
+    """
+
+    def __init__(self, model_name: str = "yolov8n.pt", confidence: float = 0.4,
+                 backend: str = "ultralytics", int8: bool = False, threads: int = 0):
+        self.backend = load_backend(backend, model_name, int8=int8, threads=threads)
         self.confidence = confidence
+        self._stream_trackers: dict[str, IouTracker] = {}
 
-    def detect(self, frame: np.ndarray) -> list[Detection]:
-        results = self.model.track(frame, conf=self.confidence, persist=True, verbose=False)
-        detections = []
-        for r in results:
-            for box in r.boxes:
-                if int(box.cls[0]) != DOG_CLASS_ID:
-                    continue
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-                tid = int(box.id[0]) if box.id is not None else None
-                detections.append(Detection(
-                    bbox=(x1, y1, x2, y2),
-                    center=(cx, cy),
-                    confidence=float(box.conf[0]),
-                    track_id=tid,
-                ))
-        return detections
+    def warm_up(self):
+        """One throwaway inference, so lazy runtime setup isn't paid on the first real frame."""
+        self.backend.predict([np.zeros(WARMUP_SHAPE, np.uint8)], self.confidence)
+
+    def detect(self, frame: np.ndarray, confidence: float | None = None) -> list[Detection]:
+        confidence = self.confidence if confidence is None else confidence
+        track = getattr(self.backend, "track", None)
+        if track is not None:
+            return [_detection(row, tid) for row, tid in track(frame, confidence)]
+        return self.detect_batch([frame], [""], [confidence])[0]
+
+    def detect_batch(self, frames: list[np.ndarray], streams: list[str],
+                     confidences: list[float] | None = None) -> list[list[Detection]]:
+        """Detect dogs in several frames with one model call.
+
+        Tracking state is kept per entry of `streams`, so IDs from one camera never
+        leak into another. `confidences` gives each frame its own threshold: the model
+        runs at the lowest and each frame's boxes are filtered to its own.
+        """
+        if not frames:
+            return []
+        confidences = confidences or [self.confidence] * len(frames)
+        batch = self.backend.predict(frames, min(confidences))
+        return [
+            track_boxes(self._stream_trackers.setdefault(stream, IouTracker()), boxes[boxes[:, 4] >= conf])
+            for stream, boxes, conf in zip(streams, batch, confidences)
+        ]
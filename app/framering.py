@@ -0,0 +1,56 @@
+import threading
+
+import numpy as np
+
+
+class FrameRing:
+    """Preallocated, reference-counted frame buffers that are reused instead of allocated per frame.
+
+    acquire() hands out a free buffer with one reference; retain()/release() adjust the
+    count and the buffer becomes reusable at zero. When every buffer is busy a fresh,
+    untracked array is returned (counted in `misses`) so callers never block.
+    Releasing an array the ring does not own is a no-op.
+
+    >>> ring = FrameRing(2)
+    >>> a = ring.acquire((2, 2, 3)); b = ring.acquire((2, 2, 3))
+    >>> c = ring.acquire((2, 2, 3)); ring.misses
+    1
+    >>> ring.release(a); ring.acquire((2, 2, 3)) is a
+    True
+    >>> ring.retain(b); ring.release(b); ring.acquire((2, 2, 3)) is b
+    False
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lock = threading.Lock()
+        self._shape: tuple | None = None
+        self._buffers: list[np.ndarray] = []
+        self._refs: dict[int, int] = {}
+        self.misses = 0
+
+    def acquire(self, shape: tuple) -> np.ndarray:
+        with self._lock:
+            if shape != self._shape:
+                # resolution changed: start a new set, buffers still in use elsewhere become untracked
+                self._shape = shape
+                self._buffers = [np.empty(shape, np.uint8) for _ in range(self.size)]
+                self._refs = {id(b): 0 for b in self._buffers}
+            for buf in self._buffers:
+                if self._refs[id(buf)] == 0:
+                    self._refs[id(buf)] = 1
+                    return buf
+            self.misses += 1
+        return np.empty(shape, np.uint8)
+
+    def retain(self, buf: np.ndarray):
+        with self._lock:
+            if id(buf) in self._refs:
+                self._refs[id(buf)] += 1
+
+    def release(self, buf: np.ndarray | None):
+        if buf is None:
+            return
+        with self._lock:
+            if self._refs.get(id(buf), 0) > 0:
+                self._refs[id(buf)] -= 1
@@ -0,0 +1,216 @@
+"""Persistent event and detection history in SQLite.
+
+Writes are queued and committed in batches by one writer thread, so the pipeline
+never waits on disk. The database runs in WAL mode, so web queries read concurrently
+with the writer. Queries page by row id (keyset pagination), so a page costs the
+same no matter how deep it is, and /api/stats reads an hourly rollup that a trigger
+maintains on insert instead of scanning events. With a retention period, events
+and detections older than it are deleted hourly; the rollup is small and kept.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from app.detector import Detection
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL_S = 1.0
+MAX_BATCH = 1000
+MAX_PAGE = 500
+PRUNE_INTERVAL_S = 3600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    camera TEXT NOT NULL,
+    kind TEXT NOT NULL,          -- enter, leave, script
+    track_id INTEGER,
+    dwell_s REAL,                -- on leave: seconds since the matching enter
+    detail TEXT
+);
+-- single-column indexes keep rowid order within a key, which keyset paging relies on
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_kind ON events (kind);
+CREATE INDEX IF NOT EXISTS events_camera ON events (camera);
+CREATE INDEX IF NOT EXISTS events_track ON events (track_id);
+CREATE TABLE IF NOT EXISTS visits_hourly (
+    hour INTEGER NOT NULL,       -- unix time of the hour's start
+    camera TEXT NOT NULL,
+    enters INTEGER NOT NULL,
+    leaves INTEGER NOT NULL,
+    dwell_s REAL NOT NULL,       -- attributed to the hour of the leave
+    PRIMARY KEY (hour, camera)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS events_rollup AFTER INSERT ON events WHEN NEW.kind IN ('enter', 'leave')
+BEGIN
+    INSERT INTO visits_hourly VALUES (
+        CAST(NEW.ts / 3600 AS INTEGER) * 3600, NEW.camera,
+        NEW.kind = 'enter', NEW.kind = 'leave', COALESCE(NEW.dwell_s, 0))
+    ON CONFLICT (hour, camera) DO UPDATE SET
+        enters = enters + excluded.enters, leaves = leaves + excluded.leaves, dwell_s = dwell_s + excluded.dwell_s;
+END;
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    camera TEXT NOT NULL,
+    track_id INTEGER,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+    confidence REAL,
+    in_roi INTEGER
+);
+CREATE INDEX IF NOT EXISTS detections_ts ON detections (ts);
+CREATE INDEX IF NOT EXISTS detections_track_ts ON detections (track_id, ts);
+"""
+
+_INSERT = {
+    "events": "INSERT INTO events (ts, camera, kind, track_id, dwell_s, detail) VALUES (?, ?, ?, ?, ?, ?)",
+    "detections": "INSERT INTO detections (ts, camera, track_id, x1, y1, x2, y2, confidence, in_roi) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+}
+
+
+class EventStore:
+    """Append-only store shared by every camera.
+
+    >>> store = EventStore(":memory:")
+    >>> store.add_event("porch", "enter", track_id=3, ts=0.0)
+    >>> store.add_event("porch", "leave", track_id=3, dwell_s=42.0, ts=60.0)
+    >>> store.flush()
+    >>> [e["kind"] for e in store.events()["events"]]
+    ['leave', 'enter']
+    >>> store.events(limit=1)["next_before"]
+    2
+    >>> store.retention_days = 1
+    >>> store.prune(now=86400 + 30.0)
+    1
+    """
+
+    def __init__(self, path: Path | str, retention_days: float = 0.0):
+        self.path = str(path)
+        self.retention_days = retention_days  # 0 keeps everything
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._queue: queue.Queue = queue.Queue()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL keeps this crash-safe, just not power-loss durable
+        return conn
+
+    def _query(self, sql: str, args: tuple) -> list[dict]:
+        if self.path == ":memory:":
+            # an in-memory database exists only on the writer's connection
+            with self._write_lock:
+                return [dict(r) for r in self._writer.execute(sql, args)]
+        conn = getattr(self._local, "conn", None)  # one reader connection per web worker thread
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return [dict(r) for r in conn.execute(sql, args)]
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="history", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10.0)
+            self._thread = None
+        self.flush()
+
+    def add_event(self, camera: str, kind: str, track_id: int | None = None, dwell_s: float | None = None,
+                  detail: str = "", ts: float | None = None):
+        self._queue.put(("events", (time.time() if ts is None else ts, camera, kind, track_id, dwell_s, detail)))
+
+    def add_detections(self, camera: str, detections: list[Detection], ts: float | None = None):
+        ts = time.time() if ts is None else ts
+        for d in detections:
+            self._queue.put(("detections", (ts, camera, d.track_id, *d.bbox, d.confidence, int(d.in_roi))))
+
+    def _run(self):
+        pruned = -PRUNE_INTERVAL_S  # prune on the first pass
+        while not self._stop.wait(FLUSH_INTERVAL_S):
+            try:
+                self.flush()
+                if time.monotonic() - pruned >= PRUNE_INTERVAL_S:
+                    pruned = time.monotonic()
+                    self.prune()
+            except sqlite3.Error:
+                logger.exception("history write failed")
+
+    def prune(self, now: float | None = None) -> int:
+        """Delete events and detections older than the retention period; returns the row count."""
+        if self.retention_days <= 0:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.retention_days * 86400
+        with self._write_lock, self._writer:
+            n = sum(self._writer.execute(f"DELETE FROM {table} WHERE ts < ?", (cutoff,)).rowcount
+                    for table in ("events", "detections"))
+        if n:
+            logger.info("Pruned %d history rows older than %g days", n, self.retention_days)
+        return n
+
+    def flush(self):
+        """Commit everything queued so far, one transaction per MAX_BATCH rows."""
+        while True:
+            rows: dict[str, list] = {"events": [], "detections": []}
+            n = 0
+            while n < MAX_BATCH:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                rows[item[0]].append(item[1])
+                n += 1
+            if not n:
+                return
+            with self._write_lock, self._writer:
+                for table, values in rows.items():
+                    if values:
+                        self._writer.executemany(_INSERT[table], values)
+            if n < MAX_BATCH:
+                return
+
+    def events(self, camera: str | None = None, kind: str | None = None, before: int | None = None,
+               since: float | None = None, until: float | None = None, limit: int = 50) -> dict:
+        """Newest-first page of events; pass the returned `next_before` to get the next page."""
+        where, args = [], []
+        for clause, value in (("camera = ?", camera), ("kind = ?", kind), ("id < ?", before),
+                              ("ts >= ?", since), ("ts < ?", until)):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        limit = max(1, min(limit, MAX_PAGE))
+        sql = "SELECT * FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        rows = self._query(sql, (*args, limit))
+        return {"events": rows, "next_before": rows[-1]["id"] if len(rows) == limit else None}
+
+    def stats(self, camera: str | None = None, days: int = 7) -> dict:
+        """Dwell time and visits per day, and enters per hour of day, over the last `days` days."""
+        since = time.time() - days * 86400
+        cam = " AND camera = ?" if camera is not None else ""
+        args = (since, camera) if camera is not None else (since,)
+        per_day = self._query(
+            "SELECT date(hour, 'unixepoch', 'localtime') AS day, SUM(leaves) AS visits, SUM(dwell_s) AS dwell_s"
+            f" FROM visits_hourly WHERE hour >= ?{cam} GROUP BY day ORDER BY day", args)
+        per_hour = self._query(
+            "SELECT CAST(strftime('%H', hour, 'unixepoch', 'localtime') AS INTEGER) AS hour, SUM(enters) AS enters"
+            f" FROM visits_hourly WHERE hour >= ?{cam} GROUP BY 1 ORDER BY 1", args)
+        return {"days": days, "dwell_per_day": per_day, "enters_per_hour": per_hour}
@@ -0,0 +1,67 @@
+import numpy as np
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (N,4) and (M,4) xyxy boxes.
+
+    >>> iou_matrix(np.array([[0, 0, 10, 10]]), np.array([[0, 0, 10, 10], [5, 0, 15, 10]])).round(2).tolist()
+    [[1.0, 0.33]]
+    """
+    a = a[:, None, :4].astype(np.float64)
+    b = b[None, :, :4].astype(np.float64)
+    iw = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    ih = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = iw * ih
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class IouTracker:
+    """Assigns stable track IDs to per-frame boxes of a single stream by greedy IoU matching.
+
+    >>> t = IouTracker()
+    >>> t.update(np.array([[0, 0, 10, 10], [50, 50, 60, 60]]))
+    [1, 2]
+    >>> t.update(np.array([[52, 50, 62, 60], [1, 0, 11, 10]]))
+    [2, 1]
+    >>> t.update(np.array([[100, 100, 110, 110]]))
+    [3]
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 30):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self._next_id = 1
+        self._boxes: dict[int, np.ndarray] = {}
+        self._age: dict[int, int] = {}
+
+    def update(self, boxes: np.ndarray) -> list[int]:
+        """Return a track ID per row of `boxes` (xyxy in the first four columns)."""
+        ids: list[int | None] = [None] * len(boxes)
+        track_ids = list(self._boxes)
+        if track_ids and len(boxes):
+            ious = iou_matrix(np.stack([self._boxes[t] for t in track_ids]), boxes)
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                ti, bi = divmod(int(flat), ious.shape[1])
+                if ious[ti, bi] < self.iou_threshold:
+                    break
+                if ids[bi] is not None or track_ids[ti] in ids:
+                    continue
+                ids[bi] = track_ids[ti]
+
+        for bi, tid in enumerate(ids):
+            if tid is None:
+                tid = self._next_id
+                self._next_id += 1
+                ids[bi] = tid
+            self._boxes[tid] = np.asarray(boxes[bi][:4], dtype=np.float32)
+            self._age[tid] = 0
+
+        for tid in list(self._boxes):
+            if tid not in ids:
+                self._age[tid] += 1
+                if self._age[tid] > self.max_age:
+                    del self._boxes[tid], self._age[tid]
+        return ids
@@ -1,14 +1,8 @@
+import argparse
 import logging
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
-import uvicorn
-
-from app.config import Config
-from app.pipeline import Pipeline
-from app.state import AppState
-from app.web.server import app as fastapi_app, set_state
-
 LOG_DIR = Path("logs")
 LOG_FILE = LOG_DIR / "dog-detector.log"
 
@@ -28,17 +22,56 @@ def _setup_logging():
     root.addHandler(stderr)
 
 
-def main():
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="dog-detector",
+                                     description="Watch a camera for dogs entering a region and run scripts.")
+    parser.add_argument("--port", type=int, help="web UI port (default: web_port from the config)")
+    parser.add_argument("--host", default="127.0.0.1", help="web UI bind address")
+    args = parser.parse_args(argv)
+
+    # imported here so --help never pays for numpy/OpenCV/FastAPI; torch and the model
+    # are only loaded by the pipeline's background loader
+    import uvicorn
+
+    from app.config import CONFIG_DIR, Config
+    from app.history import EventStore
+    from app.multi import MultiPipeline
+    from app.pipeline import Pipeline
+    from app.procpool import PooledPipeline
+    from app.reload import ConfigReloader
+    from app.state import AppState
+    from app.web.server import app as fastapi_app, set_camera_states, set_config_reloader, set_history, set_state
+
     _setup_logging()
     config = Config.load()
-    state = AppState()
-    set_state(state)
-
-    pipeline = Pipeline(config, state)
+    port = args.port or config.web_port
+    history = None
+    if config.history:
+        history = EventStore(config.history_path or CONFIG_DIR / "history.db", config.history_retention_days)
+        history.start()
+        set_history(history)
+    if config.cameras:
+        states = {name: AppState() for name in config.camera_names()}
+        set_camera_states(states)
+        state = states[config.camera_names()[0]]
+        set_state(state)
+        pipeline = MultiPipeline(config, states, history=history)
+    else:
+        state = AppState()
+        set_state(state)
+        pipeline_cls = PooledPipeline if config.inference_workers > 0 else Pipeline
+        pipeline = pipeline_cls(config, state, history=history)
+    reloader = ConfigReloader(config, list(states.values()) if config.cameras else [state])
+    set_config_reloader(reloader)
     pipeline.start()
+    reloader.start()
 
-    state.log_event(f"Started. Web on :{config.web_port}")
-    uvicorn.run(fastapi_app, host="127.0.0.1", port=config.web_port, log_level="warning")
+    state.log_event(f"Started. Web on :{port}")
+    try:
+        uvicorn.run(fastapi_app, host=args.host, port=port, log_level="warning")
+    finally:
+        if history is not None:
+            history.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+"""Process-wide counters and latency histograms, rendered in Prometheus text format.
+
+Metrics are created on first use and cached by name and labels, so hot paths can call
+`histogram("inference_ms", camera=name).observe(ms)` directly; each metric guards its
+own numbers with a private lock, so writers never contend on a shared one.
+"""
+import bisect
+import threading
+from collections.abc import Iterable
+
+PREFIX = "dog_detector_"
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: int):
+        """For counts that are maintained elsewhere and only mirrored here."""
+        with self._lock:
+            self.value = value
+
+
+class Histogram:
+    """Fixed-bucket histogram.
+
+    >>> h = Histogram((10, 100))
+    >>> for v in (1, 5, 20, 50, 500):
+    ...     h.observe(v)
+    >>> h.count, h.sum, h.counts
+    (5, 576.0, [2, 2, 1])
+    >>> h.quantile(0.5)
+    32.5
+    """
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding the q-th sample."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else lo
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[tuple[str, tuple], Counter | Histogram] = {}
+        self._help: dict[str, str] = {}
+
+    def _get(self, cls, name: str, help: str, labels: dict, *args):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = cls(*args)
+                    if help:
+                        self._help.setdefault(name, help)
+        return metric
+
+    def counter(self, name: str, help: str = "", **labels: str) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def histogram(self, name: str, help: str = "", buckets: Iterable[float] = LATENCY_BUCKETS_MS,
+                  **labels: str) -> Histogram:
+        return self._get(Histogram, name, help, labels, buckets)
+
+    def _items(self) -> list:
+        with self._lock:
+            return sorted(self._metrics.items(), key=lambda kv: kv[0])
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        typed = set()
+        for (name, labels), metric in self._items():
+            full = PREFIX + name
+            if name not in typed:
+                typed.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} {'counter' if isinstance(metric, Counter) else 'histogram'}")
+            if isinstance(metric, Counter):
+                lines.append(f"{full}{_labels(labels)} {metric.value}")
+                continue
+            with metric._lock:
+                counts, total, sum_ = list(metric.counts), metric.count, metric.sum
+            cumulative = 0
+            for bound, n in zip([*metric.buckets, "+Inf"], counts):
+                cumulative += n
+                lines.append(f"{full}_bucket{_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{full}_sum{_labels(labels)} {sum_}")
+            lines.append(f"{full}_count{_labels(labels)} {total}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """Compact view for /api/state: counter values, histogram count/mean/p50/p99."""
+        out = {}
+        for (name, labels), metric in self._items():
+            key = name + "".join(f"[{v}]" for _, v in labels)
+            if isinstance(metric, Counter):
+                out[key] = metric.value
+            else:
+                out[key] = {
+                    "count": metric.count,
+                    "mean": metric.sum / metric.count if metric.count else 0.0,
+                    "p50": metric.quantile(0.5),
+                    "p99": metric.quantile(0.99),
+                }
+        return out
+
+
+def _labels(labels: tuple, **extra) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
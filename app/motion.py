@@ -0,0 +1,91 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+from app.roi import ROI
+
+GATE_WIDTH = 160       # frames are compared at this width
+PIXEL_DELTA = 25       # grey-level change that counts a pixel as moving
+
+
+class MotionGate:
+    """Skips inference when the scene has not changed since the last inferred frame.
+
+    Frames are downscaled to GATE_WIDTH and compared against the frame that was last
+    sent to the detector, optionally only inside the ROI polygon grown by `roi_margin`
+    pixels. After `max_skip` consecutive skips inference is forced anyway, so tracker
+    hysteresis keeps advancing while nothing moves.
+
+    >>> gate = MotionGate(max_skip=2)
+    >>> still = np.zeros((90, 160, 3), np.uint8)
+    >>> [gate.should_infer(still, ROI()) for _ in range(4)]
+    [True, False, False, True]
+    >>> moved = still.copy(); moved[20:60, 40:100] = 255
+    >>> gate.should_infer(moved, ROI())
+    True
+    >>> round(gate.skip_ratio, 2)
+    0.4
+    """
+
+    def __init__(self, threshold: float = 0.01, max_skip: int = 10,
+                 roi_only: bool = True, roi_margin: int = 40):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.roi_only = roi_only
+        self.roi_margin = roi_margin
+        self._reference: np.ndarray | None = None
+        self._skipped = 0
+        self._recent: deque[bool] = deque(maxlen=100)
+        self._mask: np.ndarray | None = None
+        self._mask_key: tuple | None = None
+
+    @property
+    def skip_ratio(self) -> float:
+        """Fraction of recent scheduled inferences that were skipped."""
+        return sum(self._recent) / len(self._recent) if self._recent else 0.0
+
+    def should_infer(self, frame: np.ndarray, roi: ROI) -> bool:
+        small = self._downscale(frame)
+        if self._reference is None or self._reference.shape != small.shape:
+            moving = True
+        else:
+            changed = cv2.absdiff(small, self._reference) > PIXEL_DELTA
+            mask = self._roi_mask(roi, frame.shape, small.shape)
+            if mask is not None:
+                area = np.count_nonzero(mask)
+                moving = area > 0 and np.count_nonzero(changed & mask) / area > self.threshold
+            else:
+                moving = np.count_nonzero(changed) / changed.size > self.threshold
+
+        skip = not moving and self._skipped < self.max_skip
+        self._recent.append(skip)
+        if skip:
+            self._skipped += 1
+            return False
+        self._skipped = 0
+        self._reference = small
+        return True
+
+    def _downscale(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (GATE_WIDTH, max(1, h * GATE_WIDTH // w)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _roi_mask(self, roi: ROI, frame_shape: tuple, small_shape: tuple) -> np.ndarray | None:
+        if not self.roi_only or not roi.valid:
+            return None
+        key = (tuple(roi.points), frame_shape[:2], small_shape)
+        if key != self._mask_key:
+            scale = small_shape[1] / frame_shape[1]
+            pts = np.round(roi.polygon_array() * scale).astype(np.int32)
+            mask = np.zeros(small_shape, np.uint8)
+            cv2.fillPoly(mask, [pts], 1)
+            margin = int(self.roi_margin * scale)
+            if margin > 0:
+                kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * margin + 1, 2 * margin + 1))
+                mask = cv2.dilate(mask, kernel)
+            self._mask = mask.astype(bool)
+            self._mask_key = key
+        return self._mask
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+
+from app.config import Config
+from app.detector import DogDetector, shift_detections
+from app.history import EventStore
+from app.pipeline import Pipeline
+from app.profiling import TRACER
+from app.state import AppState
+
+logger = logging.getLogger(__name__)
+
+
+class MultiPipeline:
+    """Several cameras sharing one detector, inferred together in a single batched model call.
+
+    Each camera keeps its own Pipeline (ROI, Tracker, ScriptRunner, AppState, confidence);
+    only the model is shared. One worker thread collects whichever cameras have a fresh
+    frame and batches the ones due for inference, along with any within half an
+    interval of due, then finishes each frame on its own pipeline. Each inferred frame
+    is charged an equal share of the batch time.
+    The model loads in the background after start(), as in a single Pipeline.
+    """
+
+    def __init__(self, config: Config, states: dict[str, AppState], history: EventStore | None = None):
+        self.config = config
+        self.detector: DogDetector | None = None
+        self._cond = threading.Condition()
+        self.pipelines = {
+            name: Pipeline(config, states[name], camera=name, mailbox_cond=self._cond, history=history)
+            for name in config.camera_names()
+        }
+        self._running = False
+        self._worker: threading.Thread | None = None
+
+    def start(self):
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name="inference", daemon=True)
+        self._worker.start()
+        for p in self.pipelines.values():
+            p.start_capture()
+        threading.Thread(target=self._load_model, name="model-loader", daemon=True).start()
+
+    def _load_model(self):
+        t0 = time.time()
+        try:
+            detector = DogDetector(
+                model_name=self.config.model_name,
+                confidence=self.config.confidence,
+                backend=self.config.detector_backend,
+                int8=self.config.model_int8,
+                threads=self.config.inference_threads,
+            )
+            for p in self.pipelines.values():
+                p.state.set_model_status("warming")
+            detector.warm_up()
+        except Exception as e:
+            logger.exception("model load failed")
+            for p in self.pipelines.values():
+                p.state.set_model_status("error", error=str(e))
+            return
+        self.detector = detector
+        for p in self.pipelines.values():
+            p.detector = detector
+            p.state.set_model_status("ready", load_s=round(time.time() - t0, 2))
+
+    def stop(self):
+        for p in self.pipelines.values():
+            p.stop()
+        self._running = False
+        if self._worker is not None:
+            self._worker.join(timeout=5.0)
+
+    def _any_ready(self) -> bool:
+        return any(p.mailbox.ready for p in self.pipelines.values())
+
+    def _run(self):
+        while self._running:
+            with self._cond:
+                if not self._cond.wait_for(self._any_ready, timeout=0.5):
+                    continue
+            try:
+                self._tick()
+            except Exception:
+                logger.exception("batched inference tick crashed")
+
+    def _tick(self):
+        taken = []
+        try:
+            for name, p in self.pipelines.items():
+                item = p.mailbox.get(timeout=0)
+                if item is not None:
+                    taken.append((name, p, *item))
+            self._process(taken)
+        finally:
+            for _, p, _, frame in taken:
+                p.frames.release(frame)
+
+    def _process(self, taken: list):
+        frames = []
+        for name, p, seq, frame in taken:
+            with TRACER.span("begin", name, seq):
+                frames.append([name, p, seq, frame, p.begin_frame(frame)])
+        # cameras count frames separately, so pull in any that are close to due rather
+        # than batching whichever one happened to hit its count this tick
+        if any(f[4] for f in frames):
+            for f in frames:
+                if not f[4]:
+                    f[4] = f[1].infer_early(f[3])
+
+        results, inference_ms = {}, {}
+        due = []
+        for name, p, _, frame, infer in frames:
+            if not infer:
+                continue
+            t0 = time.perf_counter()
+            cached, token = p.cached_detections(frame)
+            if cached is not None:
+                results[name] = cached
+                inference_ms[name] = (time.perf_counter() - t0) * 1000
+            else:
+                due.append((name, p, token, *p.inference_view(frame)))
+
+        if due:
+            start_ns = time.perf_counter_ns()
+            batch = self.detector.detect_batch([image for _, _, _, image, _ in due], [name for name, *_ in due],
+                                               [p.config.confidence for _, p, *_ in due])
+            end_ns = time.perf_counter_ns()
+            per_frame_ms = (end_ns - start_ns) / 1e6 / len(due)  # each camera's share of the batch
+            seqs = {f[0]: f[2] for f in frames}
+            for (name, p, token, _, (dx, dy)), detections in zip(due, batch):
+                results[name] = shift_detections(detections, dx, dy)
+                p.remember_detections(token, results[name])
+                inference_ms[name] = per_frame_ms
+                TRACER.add("detect_batch", name, seqs[name], start_ns, end_ns)
+
+        for name, p, seq, frame, _ in frames:
+            p.finish_frame(frame, seq, results.get(name), inference_ms.get(name, 0.0))
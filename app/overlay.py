@@ -2,12 +2,43 @@ import cv2
 import numpy as np
 
 from app.detector import Detection
+from app.framering import FrameRing
 from app.roi import ROI
 
+ROI_TINT = 0.2
+OUTPUT_BUFFERS = 3  # one being drawn, one published, one still being encoded
+
 
 class OverlayPainter:
+    """Draws into reused output buffers from `ring`; whoever publishes a result releases it.
+
+    The ROI tint matches a full-frame blend over roi.mask pixel for pixel; its edge
+    pixels follow the mask's half-open rule, not cv2.fillPoly's.
+
+    >>> roi = ROI()
+    >>> roi.set_points([(10, 10), (50, 12), (30, 40)])
+    >>> frame = np.random.default_rng(0).integers(0, 256, (60, 80, 3), np.uint8)
+    >>> out = OverlayPainter().draw(frame, [], roi, dog_inside=False)
+    >>> full = cv2.addWeighted(np.full_like(frame, (0, 255, 0)), ROI_TINT, frame, 1 - ROI_TINT, 0)
+    >>> mask = np.zeros(frame.shape[:2], np.uint8)
+    >>> (ox, oy), (mh, mw) = roi.mask_origin, roi.mask.shape
+    >>> mask[oy:oy + mh, ox:ox + mw] = roi.mask
+    >>> expected = cv2.copyTo(full, mask, frame.copy())
+    >>> _ = cv2.polylines(expected, [roi.polygon_array()], isClosed=True, color=(0, 255, 0), thickness=2)
+    >>> np.array_equal(out, expected)
+    True
+    """
+
+    def __init__(self, buffers: int = OUTPUT_BUFFERS):
+        self.ring = FrameRing(buffers)
+        # scratch for the ROI tint, sized to the ROI's bounding rect and reused until it changes
+        self._tint: np.ndarray | None = None
+        self._tint_color: tuple | None = None
+        self._blend: np.ndarray | None = None
+
     def draw(self, frame: np.ndarray, detections: list[Detection], roi: ROI, dog_inside: bool) -> np.ndarray:
-        out = frame.copy()
+        out = self.ring.acquire(frame.shape)
+        np.copyto(out, frame)
         self._draw_roi(out, roi, dog_inside)
         self._draw_detections(out, detections)
         return out
@@ -17,11 +48,28 @@ class OverlayPainter:
         if pts is None:
             return
         color = (0, 0, 255) if dog_inside else (0, 255, 0)
-        overlay = frame.copy()
-        cv2.fillPoly(overlay, [pts], color)
-        cv2.addWeighted(overlay, 0.2, frame, 0.8, 0, frame)
+        if roi.mask is not None:
+            self._tint_roi(frame, roi, color)
         cv2.polylines(frame, [pts], isClosed=True, color=color, thickness=2)
 
+    def _tint_roi(self, frame: np.ndarray, roi: ROI, color: tuple):
+        """Blend `color` into the pixels under roi.mask, touching only its bounding rect."""
+        mh, mw = roi.mask.shape
+        ox, oy = roi.mask_origin
+        x0, y0 = max(ox, 0), max(oy, 0)
+        x1, y1 = min(ox + mw, frame.shape[1]), min(oy + mh, frame.shape[0])
+        if x1 <= x0 or y1 <= y0:
+            return
+        region = frame[y0:y1, x0:x1]
+        mask = roi.mask[y0 - oy:y1 - oy, x0 - ox:x1 - ox]
+        if self._tint is None or self._tint.shape != region.shape or self._tint_color != color:
+            self._tint = np.empty_like(region)
+            self._tint[:] = color
+            self._tint_color = color
+            self._blend = np.empty_like(region)
+        cv2.addWeighted(self._tint, ROI_TINT, region, 1 - ROI_TINT, 0, dst=self._blend)
+        cv2.copyTo(self._blend, mask, region)
+
     def _draw_detections(self, frame: np.ndarray, detections: list[Detection]):
         for d in detections:
             x1, y1, x2, y2 = d.bbox
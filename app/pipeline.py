@@ -1,13 +1,25 @@
 import logging
+import threading
 import time
+from pathlib import Path
 
 import numpy as np
 
-from app.camera import CameraThread
-from app.config import Config
-from app.detector import DogDetector
-from app.overlay import OverlayPainter
+from app import metrics
+from app.actions import ActionExecutor, ActionResult
+from app.camera import CameraThread, FrameMailbox
+from app.config import CONFIG_DIR, LIVE_FIELDS, Config
+from app.detection_cache import DetectionCache
+from app.detector import Detection, DogDetector, shift_detections
+from app.framering import FrameRing
+from app.history import EventStore
+from app.motion import MotionGate
+from app.overlay import OUTPUT_BUFFERS, OverlayPainter
+from app.prediction import TrackPredictor
+from app.profiling import TRACER
+from app.recorder import ClipRecorder
 from app.roi import ROI
+from app.scheduler import InferenceScheduler
 from app.script_runner import ScriptRunner
 from app.state import AppState
 from app.tracker import Tracker
@@ -16,47 +28,242 @@ logger = logging.getLogger(__name__)
 
 
 class Pipeline:
-    def __init__(self, config: Config, state: AppState):
-        self.config = config
+    """One camera's capture → detect → track → overlay chain.
+
+    `camera` names an entry of `config.cameras`; None is the single top-level camera.
+    A shared `detector` and `mailbox_cond` are passed in by MultiPipeline, which then
+    drives inference for several pipelines instead of each running its own worker.
+    Otherwise start() loads the model in the background; until it is ready, frames are
+    still captured, drawn and streamed, just not inferred.
+
+    `history`, if given, receives this camera's events and sampled detections.
+
+    Capture frames are decoded into `frames`, a ring of reused buffers; whichever loop
+    takes a frame from the mailbox releases it once finish_frame() has drawn it.
+    """
+
+    def __init__(self, config: Config, state: AppState, camera: str | None = None,
+                 detector: DogDetector | None = None, mailbox_cond: threading.Condition | None = None,
+                 history: EventStore | None = None):
+        self.root_config = config
+        self.camera = camera
+        self.history = history
+        self.config = config.for_camera(camera)
+        config = self.config
         self.state = state
         self.roi = ROI()
         if config.roi_points:
             self.roi.set_points([tuple(p) for p in config.roi_points])
             self.state.roi_points = self.roi.points
-        self.detector = DogDetector(confidence=config.confidence)
+        self.detector = detector
         self.tracker = Tracker(
             enter_frames=config.enter_frames,
             leave_frames=config.leave_frames,
             min_overlap=config.min_overlap,
         )
-        self.overlay = OverlayPainter()
-        self.script_runner = ScriptRunner(cooldown=config.cooldown)
+        label = self.label = camera or "default"
+        # the clip writer holds at most this many frames of its own while encoding
+        clip_buffers = 2 if config.record_clips else 0
+        # one being decoded, one in the mailbox, one being processed, plus pool slots in flight;
+        # without a server overlay, capture frames are also published and recorded as they are
+        self.frames = FrameRing(3 + 2 * config.inference_workers
+                                + (0 if config.server_overlay else OUTPUT_BUFFERS - 1 + clip_buffers))
+        self.overlay = OverlayPainter(OUTPUT_BUFFERS + clip_buffers)
+        published = self.overlay.ring if config.server_overlay else self.frames
+        self.state.frames.ring = published
+        self.state.server_overlay = config.server_overlay
+        self.state.frames.label = label
+        self.recorder = ClipRecorder(
+            directory=Path(config.clip_dir) if config.clip_dir else CONFIG_DIR / "clips",
+            pre_roll=config.clip_pre_roll,
+            post_roll=config.clip_post_roll,
+            fps=config.clip_fps,
+            quality=config.clip_quality,
+            quota_mb=config.clip_quota_mb,
+            ring=published,
+            max_pending=clip_buffers,
+            name=label,
+            on_saved=lambda name: self.state.log_event(f"Saved clip {name}"),
+        ) if config.record_clips else None
+        self.script_runner = ScriptRunner(
+            cooldown=config.cooldown,
+            on_fire=self._on_script_fired,
+            executor=ActionExecutor(
+                workers=config.action_workers,
+                timeout=config.action_timeout,
+                max_queue=config.action_queue,
+                on_result=self._on_action_result,
+                name=label,
+            ),
+            camera=label,
+        )
+        self.scheduler = self._make_scheduler(config)
+        self.motion_gate = self._make_motion_gate(config)
+        self.detection_cache = self._make_detection_cache(config)
+        self.predictor = self._make_predictor(config)
 
         self._last_detections: list = []
+        self._last_sampled = 0.0
+        self._visit_track: int | None = None
         self._frame_count = 0
+        self._frame_start = 0.0
         self._inference_count = 0
         self._fps_time = time.time()
         self._fps_frames = 0
         self._inf_time = time.time()
         self._inf_frames = 0
 
-        self._camera = CameraThread(source=config.camera_device, on_frame=self._on_frame)
+        self.mailbox = FrameMailbox(cond=mailbox_cond)
+        self._running = False
+        self._worker: threading.Thread | None = None
+        self._camera = CameraThread(
+            source=config.camera_device,
+            on_frame=self._on_capture,
+            name=label,
+            buffers=self.frames,
+            want_frame=(lambda: not self.mailbox.ready) if config.capture_skip else None,
+            max_fps=config.capture_max_fps,
+            backend=config.capture_backend,
+            buffer_size=config.capture_buffer_size,
+            timeout_ms=config.capture_timeout_ms,
+            options=config.capture_options,
+            on_status=self.state.log_event,
+        )
+        self.state.stream_health = self._camera.health
+        self._m_dropped = metrics.counter("frames_dropped_total", "Frames replaced before inference took them", camera=label)
+        self._m_inference = metrics.histogram("inference_ms", "Detection time per inferred frame", camera=label)
+        self._m_track = metrics.histogram("tracking_ms", "Tracker.update time", camera=label)
+        self._m_overlay = metrics.histogram("overlay_ms", "Overlay drawing time", camera=label)
+        self._m_lag = metrics.histogram("frame_lag_ms", "Time a frame waited in the mailbox", camera=label)
+        self._m_buffer_misses = metrics.counter(
+            "frame_buffer_misses_total", "Frames allocated because every ring buffer was in use", camera=label)
+
+    def _make_detector(self) -> DogDetector | None:
+        return DogDetector(
+            model_name=self.config.model_name,
+            confidence=self.config.confidence,
+            backend=self.config.detector_backend,
+            int8=self.config.model_int8,
+            threads=self.config.inference_threads,
+        )
+
+    def _make_scheduler(self, config: Config) -> InferenceScheduler:
+        return InferenceScheduler(
+            interval=config.inference_interval,
+            adaptive=config.adaptive_interval,
+            budget=config.inference_budget,
+            min_interval=config.min_inference_interval,
+            max_interval=config.max_inference_interval,
+            idle_after=config.idle_after,
+        )
+
+    def _make_motion_gate(self, config: Config) -> MotionGate | None:
+        return MotionGate(
+            threshold=config.motion_threshold,
+            max_skip=config.motion_max_skip,
+            roi_only=config.motion_roi_only,
+            roi_margin=config.motion_roi_margin,
+        ) if config.motion_gate else None
+
+    def _make_detection_cache(self, config: Config) -> DetectionCache | None:
+        return DetectionCache(
+            max_distance=config.cache_distance,
+            max_age=config.cache_max_age,
+        ) if config.detection_cache else None
+
+    def _make_predictor(self, config: Config) -> TrackPredictor | None:
+        return TrackPredictor(max_extrapolation=config.prediction_max_s) if config.motion_prediction else None
+
+    def apply_config(self, root: Config):
+        """Switch to a new root config, rebuilding only the components whose fields changed.
+
+        Called between frames from begin_frame(); fields outside LIVE_FIELDS wait for a restart.
+        """
+        new = root.for_camera(self.camera)
+        changed = {f for f in LIVE_FIELDS if getattr(new, f) != getattr(self.config, f)}
+        # build whatever may fail first, so a bad config leaves the old one fully in place
+        roi = None
+        if "roi_points" in changed:
+            roi = ROI()
+            roi.set_points([tuple(p) for p in new.roi_points])
+        scheduler, motion_gate, cache, predictor = self.scheduler, self.motion_gate, self.detection_cache, self.predictor
+        if changed & {"inference_interval", "adaptive_interval", "inference_budget", "min_inference_interval",
+                      "max_inference_interval", "idle_after"}:
+            scheduler = self._make_scheduler(new)
+        if changed & {"motion_gate", "motion_threshold", "motion_max_skip", "motion_roi_only", "motion_roi_margin"}:
+            motion_gate = self._make_motion_gate(new)
+        # an ROI change also drops boxes cached from the old region
+        if changed & {"detection_cache", "cache_distance", "cache_max_age", "roi_points", "roi_crop", "roi_crop_padding"}:
+            cache = self._make_detection_cache(new)
+        if changed & {"motion_prediction", "prediction_max_s"}:
+            predictor = self._make_predictor(new)
+
+        self.root_config, self.config = root, new
+        if not changed:
+            return
+        self.scheduler, self.motion_gate, self.detection_cache, self.predictor = scheduler, motion_gate, cache, predictor
+        if changed & {"enter_frames", "leave_frames", "min_overlap"}:
+            # tracker state (confirmed tracks, counters) survives the change
+            self.tracker.enter_frames = new.enter_frames
+            self.tracker.leave_frames = new.leave_frames
+            self.tracker.min_overlap = new.min_overlap
+        if "cooldown" in changed:
+            self.script_runner.cooldown = new.cooldown
+        if "action_timeout" in changed:
+            self.script_runner.executor.timeout = new.action_timeout
+        if roi is not None:
+            self.roi = roi
+            self.state.roi_points = roi.points
+        logger.info("Applied config change: %s", ", ".join(sorted(changed)))
+        self.state.log_event(f"Config updated: {', '.join(sorted(changed))}")
+
+    @property
+    def model_ready(self) -> bool:
+        return self.detector is not None
 
     def start(self):
+        self._running = True
+        self._worker = threading.Thread(target=self._run_inference, name="inference", daemon=True)
+        self._worker.start()
+        self.start_capture()
+        if not self.model_ready:
+            threading.Thread(target=self._load_model, name="model-loader", daemon=True).start()
+
+    def _load_model(self):
+        t0 = time.time()
+        try:
+            detector = self._make_detector()
+            self.state.set_model_status("warming")
+            detector.warm_up()
+        except Exception as e:
+            logger.exception("model load failed")
+            self.state.set_model_status("error", error=str(e))
+            return
+        self.detector = detector
+        self.state.set_model_status("ready", load_s=round(time.time() - t0, 2))
+        logger.info("Model ready in %.1fs", time.time() - t0)
+
+    def start_capture(self):
+        """Start the camera (and clip writer); inference is driven by start() or MultiPipeline."""
+        if self.recorder is not None:
+            self.recorder.start()
         self._camera.start()
 
     def stop(self):
         self._camera.stop()
+        self._running = False
+        if self._worker is not None:
+            self._worker.join(timeout=5.0)
+        if self.recorder is not None:
+            self.recorder.close()
+        self.script_runner.close()
 
-    def _on_frame(self, frame: np.ndarray):
-        try:
-            self._process_frame(frame)
-        except Exception:
-            logger.exception("pipeline frame processing crashed")
-
-    def _process_frame(self, frame: np.ndarray):
-        self._frame_count += 1
-        self.state.frame_count = self._frame_count
+    def _on_capture(self, frame: np.ndarray):
+        """Capture stage: runs on the camera thread, must never block on inference."""
+        dropped = self.mailbox.put(frame)
+        if dropped is not None:
+            self.frames.release(dropped)
+            self._m_dropped.inc()
 
         # fps calc
         self._fps_frames += 1
@@ -67,28 +274,111 @@ class Pipeline:
             self._fps_frames = 0
             self._fps_time = now
 
-        # check for web ROI updates
-        web_roi = self.state.consume_roi_update()
-        if web_roi is not None:
-            self.roi.set_points(web_roi)
-            self._save_roi()
+    def _run_inference(self):
+        """Inference stage: always processes the freshest frame, older ones are dropped."""
+        while self._running:
+            item = self.mailbox.get(timeout=0.5)
+            if item is None:
+                continue
+            seq, frame = item
+            self._on_frame(frame, seq)
+
+    def _on_frame(self, frame: np.ndarray, seq: int):
+        try:
+            self._process_frame(frame, seq)
+        except Exception:
+            logger.exception("pipeline frame processing crashed")
+        finally:
+            self.frames.release(frame)
+
+    def _process_frame(self, frame: np.ndarray, seq: int):
+        with TRACER.span("begin", self.label, seq):
+            infer = self.begin_frame(frame)
+        if not infer:
+            self.finish_frame(frame, seq, None, 0.0)
+            return
+        t0 = time.time()
+        with TRACER.span("detect", self.label, seq):
+            detections, token = self.cached_detections(frame)
+            if detections is None:
+                image, (dx, dy) = self.inference_view(frame)
+                detections = shift_detections(self.detector.detect(image, self.config.confidence), dx, dy)
+                self.remember_detections(token, detections)
+        self.finish_frame(frame, seq, detections, (time.time() - t0) * 1000)
+
+    def infer_early(self, frame: np.ndarray) -> bool:
+        """For a frame begin_frame() didn't pick: infer it anyway if the next inference is
+        within half an interval (and the motion gate agrees), so it can join a batch.
+        """
+        if not self.model_ready or not self.scheduler.pull_forward(self.scheduler.effective_interval // 2):
+            return False
+        return self.motion_gate is None or self.motion_gate.should_infer(frame, self.roi)
+
+    def cached_detections(self, frame: np.ndarray) -> tuple[list[Detection] | None, object]:
+        """(detections reused from the cache when `frame` matches the last inferred one, or
+        None; the token to hand remember_detections() with the detections inferred instead).
+        """
+        if self.detection_cache is None:
+            return None, None
+        cached, token = self.detection_cache.lookup(frame, self.roi)
+        self.state.timings["cache_hits"] = self.detection_cache.hits
+        self.state.timings["cache_misses"] = self.detection_cache.misses
+        self.state.timings["cache_hit_ratio"] = self.detection_cache.hit_ratio
+        return cached, (self.detection_cache, token)
+
+    def remember_detections(self, token, detections: list[Detection]):
+        if token is not None and token[0] is self.detection_cache:  # not rebuilt since the lookup
+            self.detection_cache.store(token[1], detections)
+
+    def inference_view(self, frame: np.ndarray) -> tuple[np.ndarray, tuple[int, int]]:
+        """The image to send to the detector and its (dx, dy) offset within `frame`."""
+        if self.config.roi_crop:
+            return self.roi.crop(frame, self.config.roi_crop_padding)
+        return frame, (0, 0)
+
+    def begin_frame(self, frame: np.ndarray) -> bool:
+        """Per-frame bookkeeping before detection. Returns True if this frame should be inferred."""
+        self._frame_count += 1
+        self.state.frame_count = self._frame_count
+        self.state.timings["dropped_frames"] = self.mailbox.dropped
+        self._camera.health.lag_ms = self.mailbox.lag_ms
+        self._m_lag.observe(self.mailbox.lag_ms)
+        self._frame_start = time.time()
+
+        new_config = self.state.consume_config_update()
+        if new_config is not None:
+            self.apply_config(new_config)
 
         # check for web triggers
         trig_enter, trig_leave = self.state.consume_triggers()
         if trig_enter and self.config.enter_script:
-            if self.script_runner.run(self.config.enter_script):
+            if self.script_runner.run(self.config.enter_script, event="enter"):
                 self.state.log_event("MANUAL ENTER TRIGGER")
         if trig_leave and self.config.leave_script:
-            if self.script_runner.run(self.config.leave_script):
+            if self.script_runner.run(self.config.leave_script, event="leave"):
                 self.state.log_event("MANUAL LEAVE TRIGGER")
 
-        # detect every Nth frame
-        detections = self._last_detections
-        inference_ms = self.state.timings.get("inference_ms", 0)
-        if self._frame_count % self.config.inference_interval == 0:
-            t0 = time.time()
-            detections = self.detector.detect(frame)
-            inference_ms = (time.time() - t0) * 1000
+        # detect when the scheduler says so, unless the motion gate says the scene is static
+        if not self.model_ready or not self.scheduler.due():
+            return False
+        if self.motion_gate is not None:
+            infer = self.motion_gate.should_infer(frame, self.roi)
+            self.state.timings["motion_skip_ratio"] = self.motion_gate.skip_ratio
+            return infer
+        return True
+
+    def finish_frame(self, frame: np.ndarray, seq: int, detections: list[Detection] | None, inference_ms: float,
+                     started: float | None = None):
+        """Track, draw and publish a frame. `detections` is None on frames that were not inferred.
+
+        `started` is when begin_frame() ran for this frame; it defaults to the latest call,
+        which is only right when frames are finished before the next one begins.
+        """
+        now = self._frame_start if started is None else started
+        if detections is None:
+            detections = self._predicted_detections(frame, now)
+            inference_ms = self.state.timings.get("inference_ms", 0)
+        else:
             self._last_detections = detections
             self._inference_count += 1
             self.state.inference_count = self._inference_count
@@ -100,27 +390,88 @@ class Pipeline:
                 self._inf_frames = 0
                 self._inf_time = now
 
+            self._m_inference.observe(inference_ms)
+
             # track
-            entered, left = self.tracker.update(detections, self.roi)
+            t0 = time.perf_counter()
+            entered_at = self.tracker.state.last_change_time
+            with TRACER.span("track", self.label, seq):
+                entered, left = self.tracker.update(detections, self.roi)
+            self._m_track.observe((time.perf_counter() - t0) * 1000)
+            if self.predictor is not None:
+                self.predictor.correct(detections, now)
+            if self.history is not None:
+                self._record_history(detections, entered, left, entered_at, now)
+            self.scheduler.observe(inference_ms, self.tracker.state)
+            self.state.timings["effective_interval"] = self.scheduler.effective_interval
+            self.state.timings["target_inference_fps"] = self.scheduler.inference_fps
+            if self.recorder is not None:
+                if entered:
+                    self.recorder.trigger("enter")
+                if left:
+                    self.recorder.trigger("leave")
             if entered:
                 self.state.log_event("DOG ENTERED")
                 if self.config.enter_script:
-                    if self.script_runner.run(self.config.enter_script):
+                    if self.script_runner.run(self.config.enter_script, event="enter"):
                         self.state.log_event("Fired enter script")
             if left:
                 self.state.log_event("DOG LEFT")
                 if self.config.leave_script:
-                    if self.script_runner.run(self.config.leave_script):
+                    if self.script_runner.run(self.config.leave_script, event="leave"):
                         self.state.log_event("Fired leave script")
 
-        # draw overlay
-        annotated = self.overlay.draw(frame, detections, self.roi, self.tracker.state.dog_inside)
+        if self.config.server_overlay:
+            t0 = time.perf_counter()
+            with TRACER.span("overlay", self.label, seq):
+                annotated = self.overlay.draw(frame, detections, self.roi, self.tracker.state.dog_inside)
+            self._m_overlay.observe((time.perf_counter() - t0) * 1000)
+        else:
+            # the dashboard draws the overlay from the frame's metadata; the broadcaster
+            # releases this extra reference once the frame is replaced
+            self.frames.retain(frame)
+            annotated = frame
+        self._m_buffer_misses.set(self.frames.misses + self.overlay.ring.misses)
+        if self.recorder is not None:
+            self.recorder.push(annotated)
         render_ms = (time.time() - now) * 1000
 
         # update shared state
-        self.state.update_frame(annotated, detections, self.tracker.as_dict(), inference_ms, render_ms)
+        with TRACER.span("publish", self.label, seq):
+            self.state.update_frame(annotated, detections, self.tracker.as_dict(), inference_ms, render_ms, seq)
+
+    def _predicted_detections(self, frame: np.ndarray, now: float) -> list[Detection]:
+        """Boxes for a frame that wasn't inferred: the last detections, moved along their tracks.
+
+        Only the overlay and in_roi see these; enter/leave hysteresis still counts real
+        inferences, so an extrapolated box can never fire an action by itself.
+        """
+        if self.predictor is None:
+            return self._last_detections
+        detections = self.predictor.predict(now, frame.shape)
+        if detections and self.roi.valid:
+            for d, overlap in zip(detections, self.roi.overlaps(np.array([d.bbox for d in detections]))):
+                d.in_roi = bool(overlap >= self.tracker.min_overlap)
+        return detections
+
+    def _on_script_fired(self, path: str):
+        if self.history is not None:
+            self.history.add_event(self.label, "script", detail=path)
+
+    def _on_action_result(self, result: ActionResult):
+        """Runs on an action worker thread."""
+        if not result.ok:
+            self.state.log_event(f"Action failed: {result.name} ({result.error or f'exit {result.code}'})")
 
-    def _save_roi(self):
-        self.state.roi_points = self.roi.points
-        self.config.roi_points = [list(p) for p in self.roi.points]
-        self.config.save()
+    def _record_history(self, detections: list[Detection], entered: bool, left: bool, entered_at: float,
+                        now: float):
+        if entered:
+            self._visit_track = min((t.track_id for t in self.tracker.state.tracks.values() if t.confirmed),
+                                    default=None)
+            self.history.add_event(self.label, "enter", track_id=self._visit_track)
+        if left:
+            self.history.add_event(self.label, "leave", track_id=self._visit_track,
+                                   dwell_s=self.tracker.state.last_change_time - entered_at)
+        if detections and now - self._last_sampled >= self.config.history_sample_s:
+            self._last_sampled = now
+            self.history.add_detections(self.label, detections, ts=now)
@@ -0,0 +1,98 @@
+from dataclasses import replace
+
+import numpy as np
+
+from app.detector import Detection
+
+# alpha-beta gains: a steady-state constant-velocity Kalman filter without the matrices.
+# Higher alpha trusts each new detection's position more, higher beta its implied velocity.
+ALPHA = 0.85
+BETA = 0.4
+MIN_DT_S = 1e-3
+
+
+class _TrackModel:
+    """Filtered (cx, cy, w, h) of one track and its velocity in pixels per second."""
+
+    def __init__(self, box: np.ndarray, ts: float):
+        self.x = box
+        self.v = np.zeros(4)
+        self.ts = ts
+        self.initialized = False  # velocity is only known after a second sighting
+
+    def correct(self, box: np.ndarray, ts: float):
+        dt = max(ts - self.ts, MIN_DT_S)
+        if not self.initialized:
+            self.v = (box - self.x) / dt
+            self.x = box
+            self.ts = ts
+            self.initialized = True
+            return
+        predicted = self.x + self.v * dt
+        residual = box - predicted
+        self.x = predicted + ALPHA * residual
+        self.v = self.v + BETA * residual / dt
+        self.ts = ts
+
+
+class TrackPredictor:
+    """Extrapolates tracked boxes onto frames that were not inferred.
+
+    correct() is fed every real inference; predict() moves the boxes of that inference
+    along each track's velocity to the given time. Boxes without a track ID stay where
+    they were, and no box is extrapolated more than `max_extrapolation` seconds past its
+    last detection, so a missed dog doesn't drift off.
+
+    >>> p = TrackPredictor()
+    >>> p.correct([Detection(bbox=(0, 0, 10, 10), center=(5, 5), confidence=0.9, track_id=1)], ts=0.0)
+    >>> p.correct([Detection(bbox=(10, 0, 20, 10), center=(15, 5), confidence=0.9, track_id=1)], ts=1.0)
+    >>> [d.center for d in p.predict(1.5, (100, 100))]
+    [(20, 5)]
+    """
+
+    def __init__(self, max_extrapolation: float = 1.0):
+        self.max_extrapolation = max_extrapolation
+        self._tracks: dict[int, _TrackModel] = {}
+        self._detections: list[Detection] = []
+
+    def correct(self, detections: list[Detection], ts: float):
+        """Update the track models with an inferred frame's detections, taken at `ts`."""
+        seen = set()
+        for d in detections:
+            if d.track_id is None:
+                continue
+            seen.add(d.track_id)
+            box = _to_cxcywh(d.bbox)
+            model = self._tracks.get(d.track_id)
+            if model is None:
+                self._tracks[d.track_id] = _TrackModel(box, ts)
+            else:
+                model.correct(box, ts)
+        for tid in list(self._tracks):
+            if tid not in seen:
+                del self._tracks[tid]  # the next sighting starts from rest, not a stale velocity
+        self._detections = detections
+
+    def predict(self, ts: float, shape: tuple) -> list[Detection]:
+        """Copies of the last detections moved to where their tracks should be at `ts`."""
+        h, w = shape[:2]
+        predicted = []
+        for d in self._detections:
+            model = self._tracks.get(d.track_id) if d.track_id is not None else None
+            if model is None:
+                predicted.append(replace(d))
+                continue
+            dt = min(max(ts - model.ts, 0.0), self.max_extrapolation)
+            cx, cy, bw, bh = model.x + model.v * dt
+            bw, bh = max(bw, 1.0), max(bh, 1.0)
+            x1 = int(np.clip(cx - bw / 2, 0, w - 1))
+            y1 = int(np.clip(cy - bh / 2, 0, h - 1))
+            x2 = int(np.clip(cx + bw / 2, x1 + 1, w))
+            y2 = int(np.clip(cy + bh / 2, y1 + 1, h))
+            predicted.append(replace(d, bbox=(x1, y1, x2, y2), center=((x1 + x2) // 2, (y1 + y2) // 2)))
+        return predicted
+
+
+def _to_cxcywh(bbox: tuple[int, int, int, int]) -> np.ndarray:
+    x1, y1, x2, y2 = bbox
+    return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=np.float64)
@@ -0,0 +1,308 @@
+import logging
+import multiprocessing as mp
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from app.backends import prepare_model, process_context
+from app.detector import WARMUP_SHAPE, Detection, shift_detections, track_boxes
+from app.iou_tracker import IouTracker
+from app.pipeline import Pipeline
+from app.profiling import TRACER
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(tasks: mp.Queue, results: Connection, backend: str, model_name: str, int8: bool, threads: int):
+    """Worker process: owns one backend, reads frames straight out of the shared slots."""
+    from app.backends import load_backend
+
+    detector = load_backend(backend, model_name, int8=int8, threads=threads)
+    detector.predict([np.zeros(WARMUP_SHAPE, np.uint8)], 0.5)  # warm up before reporting ready
+    results.send(("ready", os.getpid(), None))
+    attached: dict[int, SharedMemory] = {}  # slot -> its current segment
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        seq, slot, shm_name, shape, confidence = task
+        shm = attached.get(slot)
+        if shm is None or shm.name != shm_name:
+            if shm is not None:
+                shm.close()  # the parent replaced this slot's segment with a larger one
+            shm = attached[slot] = SharedMemory(name=shm_name)
+        frame = np.ndarray(shape, np.uint8, buffer=shm.buf)
+        try:
+            boxes = detector.predict([frame], confidence)[0]
+        except Exception:
+            logger.exception("inference worker failed on frame %d", seq)
+            boxes = None
+        del frame
+        results.send((seq, slot, boxes))
+    for shm in attached.values():
+        shm.close()
+
+
+MAX_RESPAWNS = 3  # per worker slot; a worker that keeps dying (e.g. OOM at load) is given up on
+
+
+class InferencePool:
+    """Detector backends in worker processes, fed through preallocated shared-memory slots.
+
+    submit() copies a frame into a free slot and queues only its slot name and shape,
+    so frames are never pickled. Results come back as (seq, boxes) in completion
+    order; the caller re-orders them. Each worker runs `threads` intra-op threads
+    (default: cores split evenly between workers) so workers don't oversubscribe.
+
+    Each worker has its own task queue and result pipe, so the pool knows which frames a
+    worker holds and a worker killed mid-write can't wedge a lock the others share. If one dies (OOM kill, native crash), those frames come back from get() as failed
+    (boxes None), their slots are freed and the worker is respawned, up to MAX_RESPAWNS
+    times; after that its share of the work goes to the surviving workers.
+    """
+
+    def __init__(self, workers: int, backend: str, model_name: str, int8: bool = False, threads: int = 0):
+        self.workers = workers
+        threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        model_name = prepare_model(backend, model_name, int8)
+        self._ctx = process_context()
+        self._worker_args = (backend, model_name, int8, threads)
+        # two slots per worker: one being inferred, one queued behind it
+        self._slots: list[SharedMemory | None] = [None] * (workers * 2)
+        self._free = list(range(len(self._slots)))
+        self._tasks: list[mp.Queue | None] = [None] * workers
+        self._results: list[Connection | None] = [None] * workers
+        self._ready = [False] * workers  # reported its model loaded
+        self._procs: list[mp.Process | None] = [None] * workers
+        self._assigned: list[dict[int, int]] = [{} for _ in range(workers)]  # worker -> {seq: slot}
+        self._respawns = [0] * workers
+        self._failed: deque[tuple[int, None]] = deque()
+        for i in range(workers):
+            self._spawn(i)
+
+    def _spawn(self, i: int):
+        self._tasks[i] = self._ctx.Queue()
+        self._results[i], writer = self._ctx.Pipe(duplex=False)
+        self._procs[i] = self._ctx.Process(target=_worker_main, name=f"inference-{i}", daemon=True,
+                                           args=(self._tasks[i], writer, *self._worker_args))
+        self._procs[i].start()
+        writer.close()  # the worker holds the only write end, so its death reads as EOF
+
+    def _receive(self, timeout: float) -> tuple[int, tuple] | None:
+        """(worker, message) from the first worker with a result, or None on timeout."""
+        readers = {conn: i for i, conn in enumerate(self._results) if conn is not None}
+        for conn in wait(list(readers), timeout):
+            i = readers[conn]
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                conn.close()
+                self._results[i] = None  # died; _reap() fails its frames and respawns it
+                continue
+            if message[0] == "ready":
+                self._ready[i] = True
+                continue
+            return i, message
+        return None
+
+    @property
+    def ready(self) -> int:
+        """Live workers that have loaded and warmed up their model."""
+        return sum(self._ready)
+
+    def wait_ready(self):
+        """Block until every worker has loaded and warmed up its model."""
+        while self.ready < self.workers:
+            if self._receive(1.0) is None and not all(p.is_alive() for p in self._procs):
+                raise RuntimeError("an inference worker exited during startup")
+
+    @property
+    def has_free_slot(self) -> bool:
+        return bool(self._free)
+
+    def submit(self, seq: int, frame: np.ndarray, confidence: float) -> bool:
+        """Queue `frame` for inference; False if every slot is busy or no worker is left."""
+        self._reap()
+        live = [i for i, p in enumerate(self._procs) if p is not None]
+        if not self._free or not live:
+            return False
+        worker = min(live, key=lambda i: len(self._assigned[i]))
+        slot = self._free.pop()
+        shm = self._slots[slot]
+        if shm is None or shm.size < frame.nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = self._slots[slot] = SharedMemory(create=True, size=frame.nbytes)
+        np.copyto(np.ndarray(frame.shape, np.uint8, buffer=shm.buf), frame)
+        self._assigned[worker][seq] = slot
+        self._tasks[worker].put((seq, slot, shm.name, frame.shape, confidence))
+        return True
+
+    def get(self, timeout: float) -> tuple[int, np.ndarray | None] | None:
+        """Next finished (seq, boxes), or None on timeout. boxes is None if the worker failed or died."""
+        self._reap()
+        while True:
+            if self._failed:
+                return self._failed.popleft()
+            received = self._receive(timeout)
+            if received is None:
+                self._reap()
+                return self._failed.popleft() if self._failed else None
+            i, (seq, slot, boxes) = received
+            if self._assigned[i].pop(seq, None) is not None:
+                self._free.append(slot)
+                return seq, boxes
+            # a result from a worker already written off as dead: its frame was failed
+
+    def _reap(self):
+        """Fail the frames of any worker that died and respawn it."""
+        for i, proc in enumerate(self._procs):
+            if proc is None or proc.is_alive():
+                continue
+            lost = self._assigned[i]
+            logger.error("Inference worker %d exited (code %s) holding %d frame(s)", i, proc.exitcode, len(lost))
+            for seq, slot in sorted(lost.items()):
+                self._failed.append((seq, None))
+                self._free.append(slot)
+            self._assigned[i] = {}
+            self._ready[i] = False  # only counted if it got as far as reporting ready
+            self._tasks[i].cancel_join_thread()
+            if self._results[i] is not None:
+                self._results[i].close()
+            if self._respawns[i] < MAX_RESPAWNS:
+                self._respawns[i] += 1
+                self._spawn(i)
+            else:
+                logger.error("Inference worker %d keeps dying; continuing without it", i)
+                self._procs[i] = self._tasks[i] = self._results[i] = None
+
+    def close(self):
+        for tasks in self._tasks:
+            if tasks is not None:
+                tasks.put(None)
+        for p in self._procs:
+            if p is None:
+                continue
+            p.join(timeout=5.0)
+            if p.is_alive():
+                p.terminate()
+        for conn in self._results:
+            if conn is not None:
+                conn.close()
+        for shm in self._slots:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        self._slots = []
+
+
+@dataclass
+class _InFlight:
+    seq: int
+    frame: np.ndarray
+    offset: tuple[int, int] = (0, 0)
+    submitted_ns: int = 0
+    done: bool = True
+    boxes: np.ndarray | None = None
+    cached: list[Detection] | None = None
+    cache_token: object = None
+    started: float | None = None  # when begin_frame() ran; later frames begin while this one is in flight
+    inference_ms: float = 0.0
+
+
+class PooledPipeline(Pipeline):
+    """Pipeline whose detection runs in an InferencePool instead of the inference thread.
+
+    Frames are submitted as soon as a slot is free and finished strictly in capture
+    order, so track IDs and Tracker hysteresis see the same sequence as in-thread mode.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool_tracker = IouTracker()
+        self._pool: InferencePool | None = None
+
+    @property
+    def model_ready(self) -> bool:
+        return self._pool is not None
+
+    def _load_model(self):
+        t0 = time.time()
+        try:
+            pool = InferencePool(
+                self.config.inference_workers,
+                backend=self.config.detector_backend,
+                model_name=self.config.model_name,
+                int8=self.config.model_int8,
+                threads=self.config.inference_threads,
+            )
+            self.state.set_model_status("warming")
+            pool.wait_ready()
+        except Exception as e:
+            logger.exception("inference pool failed to start")
+            self.state.set_model_status("error", error=str(e))
+            return
+        self._pool = pool
+        self.state.set_model_status("ready", load_s=round(time.time() - t0, 2))
+
+    def stop(self):
+        super().stop()
+        if self._pool is not None:
+            self._pool.close()
+
+    def _run_inference(self):
+        pending: deque[_InFlight] = deque()
+        while self._running:
+            pool = self._pool  # None until _load_model finishes; frames then pass through uninferred
+            if pool is None or pool.has_free_slot:
+                item = self.mailbox.get(timeout=0.005 if pending else 0.5)
+                if item is not None:
+                    pending.append(self._submit(*item))
+            result = pool.get(timeout=0.005 if pending else 0) if pool is not None else None
+            while result is not None:
+                seq, boxes = result
+                for entry in pending:
+                    if entry.seq == seq:
+                        entry.boxes, entry.done = boxes, True
+                        done_ns = time.perf_counter_ns()
+                        entry.inference_ms = (done_ns - entry.submitted_ns) / 1e6
+                        TRACER.add("detect", self.label, seq, entry.submitted_ns, done_ns)
+                        break
+                result = pool.get(timeout=0)
+            while pending and pending[0].done:
+                self._finish(pending.popleft())
+
+    def _submit(self, seq: int, frame: np.ndarray) -> _InFlight:
+        entry = _InFlight(seq, frame)
+        try:
+            with TRACER.span("begin", self.label, seq):
+                infer = self.begin_frame(frame)
+            entry.started = self._frame_start
+            if not infer:
+                return entry
+            entry.cached, entry.cache_token = self.cached_detections(frame)
+            if entry.cached is None:
+                image, entry.offset = self.inference_view(frame)
+                entry.submitted_ns = time.perf_counter_ns()
+                entry.done = not self._pool.submit(seq, image, self.config.confidence)
+        except Exception:
+            logger.exception("pipeline frame submission crashed")
+        return entry
+
+    def _finish(self, entry: _InFlight):
+        try:
+            detections = entry.cached
+            if entry.boxes is not None:
+                # IDs are assigned here, in capture order, not in worker completion order
+                detections = shift_detections(track_boxes(self._pool_tracker, entry.boxes), *entry.offset)
+                self.remember_detections(entry.cache_token, detections)
+            self.finish_frame(entry.frame, entry.seq, detections, entry.inference_ms, entry.started)
+        except Exception:
+            logger.exception("pipeline frame processing crashed")
+        finally:
+            self.frames.release(entry.frame)
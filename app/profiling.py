@@ -0,0 +1,135 @@
+"""On-demand diagnostics for a running detector: a stack sampler and a per-frame stage tracer.
+
+sample_stacks() walks every thread's Python stack at a fixed interval and returns the
+counts in collapsed-stack format (one "thread;outer;...;inner count" line per distinct
+stack), which flamegraph.pl and speedscope read directly. A thread blocked on the GIL
+or a lock shows up in the frame it is waiting in, so contention appears as time too.
+
+TRACER records the start and end of each pipeline stage for the last few frames once
+enabled, and exports them as Chrome trace JSON (chrome://tracing, Perfetto).
+"""
+import contextlib
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+_NOT_TRACING = contextlib.nullcontext()
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, threads: tuple[str, ...] = ()) -> str:
+    """Sample every thread (or those whose name starts with one of `threads`) for `seconds`."""
+    me = threading.get_ident()
+    counts: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, str(ident))
+            if ident == me or (threads and not name.startswith(threads)):
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            counts[(name, *reversed(stack))] += 1
+        time.sleep(interval)
+    return "".join(f"{';'.join(stack)} {n}\n" for stack, n in counts.most_common())
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "camera", "seq", "create", "start")
+
+    def __init__(self, tracer: "FrameTracer", name: str, camera: str, seq: int, create: bool):
+        self.tracer = tracer
+        self.name = name
+        self.camera = camera
+        self.seq = seq
+        self.create = create
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+
+    def __exit__(self, *exc):
+        self.tracer.add(self.name, self.camera, self.seq, self.start, time.perf_counter_ns(), self.create)
+
+
+class FrameTracer:
+    """Stage spans of the last `frames` frames per process, off (and free) until enabled.
+
+    >>> tracer = FrameTracer()
+    >>> with tracer.span("detect", "porch", 1):
+    ...     pass
+    >>> tracer.chrome_trace()["traceEvents"]
+    []
+    >>> tracer.enable(2)
+    >>> for seq in (1, 2, 3):
+    ...     tracer.add("detect", "porch", seq, 1_000_000, 3_000_000)
+    >>> tracer.add("jpeg", "porch", 1, 3_000_000, 4_000_000, create=False)
+    >>> [(e["args"]["seq"], e["dur"]) for e in tracer.chrome_trace()["traceEvents"] if e["ph"] == "X"]
+    [(2, 2000.0), (3, 2000.0)]
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frames = 0
+        self._spans: OrderedDict[tuple[str, int], list[tuple]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.frames > 0
+
+    def enable(self, frames: int):
+        """Keep spans for the last `frames` frames; 0 turns tracing off and drops them."""
+        with self._lock:
+            self.frames = frames
+            if not frames:
+                self._spans.clear()
+            while len(self._spans) > frames:
+                self._spans.popitem(last=False)
+
+    def span(self, name: str, camera: str, seq: int, create: bool = True):
+        """Context manager timing one stage of frame `seq`."""
+        if not self.frames:
+            return _NOT_TRACING
+        return _Span(self, name, camera, seq, create)
+
+    def add(self, name: str, camera: str, seq: int, start_ns: int, end_ns: int, create: bool = True):
+        """Record a span of frame `seq`; with create=False only if that frame is still kept,
+        for stages that may run long after (or without) the frame's own pipeline spans.
+        """
+        if not self.frames:
+            return
+        thread = threading.current_thread()
+        with self._lock:
+            key = (camera, seq)
+            spans = self._spans.get(key)
+            if spans is None:
+                if not create:
+                    return
+                spans = self._spans[key] = []
+                while len(self._spans) > self.frames:
+                    self._spans.popitem(last=False)
+            spans.append((name, start_ns, end_ns, thread.ident, thread.name))
+
+    def chrome_trace(self) -> dict:
+        """The recorded spans as Chrome trace events: one process per camera, one row per thread."""
+        with self._lock:
+            recorded = [(key, list(spans)) for key, spans in self._spans.items()]
+        events, pids, threads = [], {}, {}
+        for (camera, seq), spans in recorded:
+            pid = pids.setdefault(camera, len(pids) + 1)
+            for name, start, end, tid, thread in spans:
+                threads[(pid, tid)] = thread
+                events.append({"name": name, "cat": "frame", "ph": "X", "pid": pid, "tid": tid,
+                               "ts": start / 1000, "dur": (end - start) / 1000, "args": {"seq": seq}})
+        events += [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": camera}}
+                   for camera, pid in pids.items()]
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                   for (pid, tid), name in threads.items()]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+TRACER = FrameTracer()
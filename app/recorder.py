@@ -0,0 +1,186 @@
+import logging
+import math
+import queue
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app import metrics
+from app.framering import FrameRing
+
+logger = logging.getLogger(__name__)
+
+MAX_CLIP_S = 120.0  # repeated events extend a clip, but never past this
+IDLE_CHECK_S = 0.5  # how often an open clip is checked for its end when no frames arrive
+
+
+class _Clip:
+    def __init__(self, start: float, end: float, label: str, frames: list[tuple[float, bytes]]):
+        self.start = start
+        self.end = end
+        self.labels = [label]
+        self.frames = frames
+
+
+class ClipRecorder:
+    """Saves a short clip around each enter/leave event, off the capture and inference threads.
+
+    push() samples annotated frames at `fps` and hands them to a writer thread, which
+    JPEG-compresses them into a pre-roll ring of `pre_roll` seconds. trigger() opens a
+    clip from that ring and keeps appending for `post_roll` seconds (events inside an
+    open clip extend it), then the clip is written as MP4 and the oldest clips in
+    `directory` are deleted until it fits in `quota_mb`. A clip is written when its
+    post-roll is over even if no more frames arrive, and on close().
+
+    Frames from `ring` are retained until encoded, at most `max_pending` at a time (size
+    the ring with that many spare buffers); if the writer falls behind, frames are
+    dropped rather than taken from the ring's other users.
+    """
+
+    def __init__(self, directory: Path, pre_roll: float = 5.0, post_roll: float = 5.0, fps: float = 10.0,
+                 quality: int = 80, quota_mb: float = 500.0, ring: FrameRing | None = None, max_pending: int = 2,
+                 name: str = "default", on_saved: Callable[[str], None] = lambda _: None):
+        self.directory = Path(directory)
+        self.pre_roll = pre_roll
+        self.post_roll = post_roll
+        self.fps = fps
+        self.quality = quality
+        self.quota_bytes = int(quota_mb * 1024 * 1024)
+        self.ring = ring
+        self.name = name
+        self._on_saved = on_saved
+        self._preroll: deque[tuple[float, bytes]] = deque(maxlen=math.ceil(pre_roll * fps) + 1)
+        self._clip: _Clip | None = None
+        self._last_sample = 0.0
+        # unbounded so trigger() never blocks; frames are bounded by push() instead
+        self._queue: queue.Queue = queue.Queue()
+        # frames queued or being encoded; released once the writer is done with each
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._thread: threading.Thread | None = None
+        self.saved = 0
+        self._m_dropped = metrics.counter("clip_frames_dropped_total", "Frames the clip writer could not keep up with",
+                                          camera=name)
+        self._m_write = metrics.histogram("clip_write_ms", "Time to write one event clip", camera=name)
+
+    def start(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name=f"clips-{self.name}", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=30.0)
+        self._thread = None
+
+    def push(self, frame: np.ndarray):
+        """Offer an annotated frame; cheap enough to call from the inference thread every frame."""
+        now = time.time()
+        if now - self._last_sample < 1.0 / self.fps:
+            return
+        self._last_sample = now
+        if not self._pending.acquire(blocking=False):
+            self._m_dropped.inc()
+            return
+        if self.ring is not None:
+            self.ring.retain(frame)
+        self._queue.put((now, frame))
+
+    def trigger(self, label: str):
+        self._queue.put((time.time(), label))
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=IDLE_CHECK_S)
+            except queue.Empty:
+                # frames stopped (camera lost, file ended): close the clip on time anyway
+                if self._clip is not None and time.time() >= self._clip.end:
+                    self._finish()
+                continue
+            if item is None:
+                break
+            ts, payload = item
+            try:
+                if isinstance(payload, str):
+                    self._on_event(ts, payload)
+                else:
+                    self._on_frame(ts, payload)
+            except Exception:
+                logger.exception("clip recorder failed")
+        if self._clip is not None:
+            self._finish()
+
+    def _on_frame(self, ts: float, frame: np.ndarray):
+        try:
+            ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        finally:
+            if self.ring is not None:
+                self.ring.release(frame)
+            self._pending.release()
+        if not ok:
+            return
+        entry = (ts, buf.tobytes())
+        self._preroll.append(entry)
+        if self._clip is not None:
+            self._clip.frames.append(entry)
+            if ts >= self._clip.end:
+                self._finish()
+
+    def _on_event(self, ts: float, label: str):
+        if self._clip is not None:
+            self._clip.end = min(ts + self.post_roll, self._clip.start + MAX_CLIP_S)
+            self._clip.labels.append(label)
+            return
+        self._clip = _Clip(ts, ts + self.post_roll, label, [f for f in self._preroll if f[0] >= ts - self.pre_roll])
+
+    def _finish(self):
+        clip, self._clip = self._clip, None
+        if not clip.frames:
+            return
+        t0 = time.perf_counter()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(clip.start))
+        label = re.sub(r"[^\w-]+", "_", "-".join(dict.fromkeys(clip.labels)))
+        path = self.directory / f"{stamp}-{self.name}-{label}.mp4"
+        first = cv2.imdecode(np.frombuffer(clip.frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        h, w = first.shape[:2]
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (w, h))
+        try:
+            for _, jpeg in clip.frames:
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if frame.shape[:2] == (h, w):
+                    writer.write(frame)
+        finally:
+            writer.release()
+        self._m_write.observe((time.perf_counter() - t0) * 1000)
+        self.saved += 1
+        logger.info("Saved clip %s (%d frames)", path, len(clip.frames))
+        self._enforce_quota(path)
+        self._on_saved(path.name)
+
+    def _enforce_quota(self, keep: Path):
+        """Delete the oldest clips (never `keep`) until the directory fits the quota."""
+        clips = []
+        for path in self.directory.glob("*.mp4"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:  # another camera's recorder evicted it
+                continue
+            clips.append((st.st_mtime, st.st_size, path))
+        clips.sort()
+        total = sum(size for _, size, _ in clips)
+        for _, size, old in clips:
+            if total <= self.quota_bytes:
+                break
+            if old == keep:
+                continue
+            old.unlink(missing_ok=True)
+            total -= size
+            logger.info("Evicted clip %s to stay under quota", old.name)
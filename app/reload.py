@@ -0,0 +1,89 @@
+import copy
+import json
+import logging
+import threading
+from dataclasses import fields
+
+from app.config import CONFIG_PATH, FILE_ONLY_FIELDS, LIVE_FIELDS, Config
+from app.state import AppState
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_S = 1.0
+
+
+class ConfigReloader:
+    """Owns the live root Config and hands new versions to the pipelines.
+
+    Changes arrive from the web (update()) or from edits to the config file, which is
+    polled for a new mtime. Each accepted change is validated, saved and handed to every
+    camera's AppState; pipelines pick it up at the start of their next frame, so a frame
+    always runs under one consistent config.
+    """
+
+    def __init__(self, config: Config, states: list[AppState]):
+        self.config = config
+        self.states = states
+        self._lock = threading.Lock()
+        self._mtime = self._file_mtime()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, name="config-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def update(self, camera: str | None, changes: dict) -> dict:
+        """Apply web edits to one camera (None = top level). Raises ValueError if invalid."""
+        unknown = sorted(set(changes) - {f.name for f in fields(Config)})
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(unknown)}")
+        file_only = sorted(set(changes) & FILE_ONLY_FIELDS)
+        if file_only:
+            raise ValueError(f"only the config file can set: {', '.join(file_only)}")
+        with self._lock:
+            new = copy.deepcopy(self.config)
+            new.update_camera(camera, **changes)
+            new.for_camera(camera).validate()
+            new.validate()
+            new.save()
+            self._mtime = self._file_mtime()
+            self._publish(new)
+        return {
+            "applied": sorted(set(changes) & LIVE_FIELDS),
+            "restart_required": sorted(set(changes) - LIVE_FIELDS),
+        }
+
+    def _file_mtime(self) -> int:
+        try:
+            return CONFIG_PATH.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _watch(self):
+        while not self._stop.wait(POLL_INTERVAL_S):
+            mtime = self._file_mtime()
+            if mtime == self._mtime:
+                continue
+            with self._lock:
+                self._mtime = mtime
+                try:
+                    new = Config.load()
+                    new.validate()
+                    for name in new.camera_names():
+                        new.for_camera(name).validate()
+                except (ValueError, TypeError, KeyError, json.JSONDecodeError) as e:
+                    logger.warning("Ignoring invalid config file: %s", e)
+                    continue
+                if new == self.config:
+                    continue  # our own save, or a save by a pipeline (ROI edits)
+                logger.info("Config file changed, reloading")
+                self._publish(new)
+
+    def _publish(self, new: Config):
+        self.config = new
+        for state in self.states:
+            state.set_config_update(new)
@@ -0,0 +1,41 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+DEFAULT_FPS = 30.0
+
+
+def iter_frames(path: str | Path, stride: int = 1, fps: float | None = None) -> Iterator[tuple[float, np.ndarray]]:
+    """Yield (timestamp_s, frame) for every `stride`-th frame of a video file or image directory.
+
+    Videos are streamed: skipped frames are only grabbed, never converted to BGR.
+    Image directories are read in name order at `fps` (DEFAULT_FPS if not given).
+    """
+    path = Path(path)
+    stride = max(1, stride)
+    if path.is_dir():
+        files = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        rate = fps or DEFAULT_FPS
+        for i in range(0, len(files), stride):
+            frame = cv2.imread(str(files[i]))
+            if frame is not None:
+                yield i / rate, frame
+        return
+
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise OSError(f"cannot open video {path}")
+    rate = fps or cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    index = 0
+    try:
+        while cap.grab():
+            if index % stride == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    yield index / rate, frame
+            index += 1
+    finally:
+        cap.release()
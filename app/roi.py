@@ -1,11 +1,16 @@
+import cv2
 import numpy as np
-from shapely.geometry import Point, Polygon, box
+from shapely.geometry import Polygon
 
 
 class ROI:
     def __init__(self):
         self.points: list[tuple[int, int]] = []
         self._polygon: Polygon | None = None
+        # rasterized polygon over its bounding rect, rebuilt whenever the points change
+        self.mask: np.ndarray | None = None
+        self.mask_origin: tuple[int, int] = (0, 0)
+        self._integral: np.ndarray | None = None
 
     @property
     def valid(self) -> bool:
@@ -21,32 +26,133 @@ class ROI:
             self._polygon = Polygon(self.points)
         else:
             self._polygon = None
+        self._rasterize()
 
     def add_point(self, x: int, y: int):
         self.points.append((x, y))
         if len(self.points) >= 3:
             self._polygon = Polygon(self.points)
+        self._rasterize()
 
     def clear(self):
         self.points = []
         self._polygon = None
+        self._rasterize()
 
-    def contains(self, x: int, y: int) -> bool:
+    def _rasterize(self):
+        """Fill the polygon into a mask over its bounding rect and build its summed-area table.
+
+        A pixel (x, y) covers [x, x+1) x [y, y+1) and is inside when its centre is, so
+        edges are half-open and overlaps are exact to a pixel (cv2.fillPoly would also
+        fill every pixel an edge touches).
+        """
         if not self.valid:
+            self.mask = None
+            self._integral = None
+            return
+        pts = self.polygon_array()
+        x0, y0 = pts.min(axis=0)
+        x1, y1 = pts.max(axis=0)
+        mask = np.zeros((y1 - y0 + 1, x1 - x0 + 1), np.uint8)
+        _fill_centres(mask, pts - (x0, y0))
+        self.mask = mask
+        self.mask_origin = (int(x0), int(y0))
+        self._integral = cv2.integral(mask, sdepth=cv2.CV_32S)
+
+    def contains(self, x: int, y: int) -> bool:
+        if self.mask is None:
             return False
-        return self._polygon.contains(Point(x, y))
+        mx, my = x - self.mask_origin[0], y - self.mask_origin[1]
+        h, w = self.mask.shape
+        return 0 <= mx < w and 0 <= my < h and bool(self.mask[my, mx])
+
+    def overlaps(self, boxes: np.ndarray) -> np.ndarray:
+        """Fraction of each (N,4) x1, y1, x2, y2 box's area inside the ROI, in one pass.
+
+        >>> roi = ROI()
+        >>> roi.set_points([(0, 0), (200, 0), (200, 200), (0, 200)])
+        >>> roi.overlaps(np.array([[25, 25, 75, 75], [150, 150, 250, 250], [300, 0, 310, 10], [5, 5, 5, 9]])).tolist()
+        [1.0, 0.25, 0.0, 0.0]
+        """
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        if self._integral is None or len(boxes) == 0:
+            return np.zeros(len(boxes))
+        h, w = self.mask.shape
+        x0, y0 = self.mask_origin
+        xs = np.clip(boxes[:, [0, 2]] - x0, 0, w)
+        ys = np.clip(boxes[:, [1, 3]] - y0, 0, h)
+        ii = self._integral
+        inside = ii[ys[:, 1], xs[:, 1]] - ii[ys[:, 0], xs[:, 1]] - ii[ys[:, 1], xs[:, 0]] + ii[ys[:, 0], xs[:, 0]]
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        return np.where(area > 0, inside / np.maximum(area, 1), 0.0)
 
     def bbox_overlap(self, x1: int, y1: int, x2: int, y2: int) -> float:
         """Fraction of bbox area that intersects the ROI (0.0–1.0)."""
+        return float(self.overlaps(np.array([[x1, y1, x2, y2]]))[0])
+
+    def bounding_rect(self, padding: int, frame_shape: tuple[int, ...]) -> tuple[int, int, int, int] | None:
+        """Padded x1, y1, x2, y2 around the polygon, clipped to the frame.
+
+        >>> roi = ROI()
+        >>> roi.set_points([(100, 50), (300, 60), (200, 400)])
+        >>> roi.bounding_rect(32, (360, 640, 3))
+        (68, 18, 333, 360)
+        """
         if not self.valid:
-            return 0.0
-        bbox_poly = box(x1, y1, x2, y2)
-        bbox_area = bbox_poly.area
-        if bbox_area == 0:
-            return 0.0
-        return self._polygon.intersection(bbox_poly).area / bbox_area
+            return None
+        h, w = frame_shape[:2]
+        xs = [p[0] for p in self.points]
+        ys = [p[1] for p in self.points]
+        x1, y1 = max(0, min(xs) - padding), max(0, min(ys) - padding)
+        x2, y2 = min(w, max(xs) + padding + 1), min(h, max(ys) + padding + 1)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def crop(self, frame: np.ndarray, padding: int) -> tuple[np.ndarray, tuple[int, int]]:
+        """The padded bounding_rect() view of `frame` and its (dx, dy) offset; the whole frame without a valid polygon.
+
+        >>> roi = ROI()
+        >>> roi.set_points([(100, 50), (300, 60), (200, 400)])
+        >>> view, offset = roi.crop(np.zeros((360, 640, 3), np.uint8), 32)
+        >>> view.shape, offset
+        ((342, 265, 3), (68, 18))
+        """
+        rect = self.bounding_rect(padding, frame.shape)
+        if rect is None:
+            return frame, (0, 0)
+        x1, y1, x2, y2 = rect
+        return frame[y1:y2, x1:x2], (x1, y1)
 
     def polygon_array(self) -> np.ndarray | None:
         if not self.points:
             return None
         return np.array(self.points, dtype=np.int32)
+
+
+def _fill_centres(mask: np.ndarray, pts: np.ndarray):
+    """Set the pixels of `mask` whose centres lie inside polygon `pts` (even-odd rule).
+
+    >>> m = np.zeros((4, 5), np.uint8)
+    >>> _fill_centres(m, np.array([[0, 0], [4, 0], [4, 3], [0, 3]]))
+    >>> int(m.sum()), m.shape
+    (12, (4, 5))
+    """
+    yc = np.arange(mask.shape[0]) + 0.5
+    crossings: list[list[float]] = [[] for _ in yc]
+    a, b = pts.astype(np.float64), np.roll(pts, -1, axis=0).astype(np.float64)
+    for (xa, ya), (xb, yb) in zip(a, b):
+        if ya == yb:
+            continue
+        lo, hi = min(ya, yb), max(ya, yb)
+        rows = np.nonzero((yc >= lo) & (yc < hi))[0]
+        xs = xa + (yc[rows] - ya) * (xb - xa) / (yb - ya)
+        for row, x in zip(rows, xs):
+            crossings[row].append(x)
+    w = mask.shape[1]
+    for row, xs in enumerate(crossings):
+        xs.sort()
+        for left, right in zip(xs[::2], xs[1::2]):
+            # pixel x is inside when left <= x + 0.5 < right
+            start, stop = int(np.ceil(left - 0.5)), int(np.ceil(right - 0.5))
+            mask[row, max(start, 0):min(stop, w)] = 1
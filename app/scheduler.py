@@ -0,0 +1,105 @@
+import math
+import time
+
+from app.tracker import TrackerState
+
+
+class InferenceScheduler:
+    """Decides which frames are sent to the detector.
+
+    Fixed mode infers every `interval` frames, like the old `frame_count % interval`.
+    Adaptive mode picks the interval each frame from:
+
+    * the budget: the fraction of wall time inference may take, given the measured
+      inference time and frame period, sets the shortest allowed interval;
+    * activity: tracks that are partway to entering, or a confirmed dog, run at the
+      shortest allowed interval; a scene with no tracks for `idle_after` seconds
+      backs off to `max_interval`; anything else uses `interval`.
+
+    >>> s = InferenceScheduler(interval=3)
+    >>> [s.due() for _ in range(6)]
+    [False, False, True, False, False, True]
+
+    >>> s = InferenceScheduler(interval=5, adaptive=True, min_interval=1, max_interval=15, idle_after=0)
+    >>> s.observe(10.0, TrackerState(), now=0.0); s.effective_interval
+    15
+    >>> s.observe(10.0, TrackerState(dog_inside=True), now=1.0); s.effective_interval
+    1
+    """
+
+    def __init__(self, interval: int = 5, adaptive: bool = False, budget: float = 0.5,
+                 min_interval: int = 1, max_interval: int = 15, idle_after: float = 30.0):
+        self.interval = interval
+        self.adaptive = adaptive
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_after = idle_after
+        self.effective_interval = interval
+        self._since = 0
+        self._inference_s = 0.0
+        self._frame_period_s = 0.0
+        self._last_frame: float | None = None
+        self._last_activity: float | None = None
+
+    @property
+    def inference_fps(self) -> float:
+        """Inference rate the current interval yields at the measured frame rate."""
+        if self._frame_period_s <= 0:
+            return 0.0
+        return 1.0 / (self._frame_period_s * self.effective_interval)
+
+    def due(self) -> bool:
+        """Call once per frame; True when this frame should be inferred."""
+        now = time.time()
+        if self._last_frame is not None:
+            self._frame_period_s = _ema(self._frame_period_s, now - self._last_frame)
+        self._last_frame = now
+        self._since += 1
+        if self._since < self.effective_interval:
+            return False
+        self._since = 0
+        return True
+
+    def pull_forward(self, slack: int) -> bool:
+        """Count this frame as the next inference if that is at most `slack` frames away.
+
+        Lets cameras sharing a batch infer together instead of each on its own count.
+
+        >>> s = InferenceScheduler(interval=5)
+        >>> [s.due() for _ in range(3)], s.pull_forward(1), s.pull_forward(2)
+        ([False, False, False], False, True)
+        >>> [s.due() for _ in range(5)]
+        [False, False, False, False, True]
+        """
+        if self.effective_interval - self._since > slack:
+            return False
+        self._since = 0
+        return True
+
+    def observe(self, inference_ms: float, tracker: TrackerState, now: float | None = None):
+        """Feed back a finished inference and the tracker state it produced."""
+        if not self.adaptive:
+            return
+        now = time.time() if now is None else now
+        self._inference_s = _ema(self._inference_s, inference_ms / 1000)
+
+        floor = self.min_interval
+        if self._frame_period_s > 0 and self.budget > 0:
+            floor = max(floor, math.ceil(self._inference_s / (self.budget * self._frame_period_s)))
+        floor = min(floor, self.max_interval)
+
+        approaching = any(t.in_roi_count > 0 or t.confirmed for t in tracker.tracks.values())
+        if tracker.tracks or tracker.dog_inside or self._last_activity is None:
+            self._last_activity = now
+        if tracker.dog_inside or approaching:
+            interval = floor
+        elif now - self._last_activity >= self.idle_after:
+            interval = self.max_interval
+        else:
+            interval = self.interval
+        self.effective_interval = max(floor, min(interval, self.max_interval))
+
+
+def _ema(avg: float, sample: float, alpha: float = 0.2) -> float:
+    return sample if avg == 0 else avg + alpha * (sample - avg)
@@ -1,28 +1,42 @@
-import subprocess
 import time
+from collections.abc import Callable
+
+from app.actions import Action, ActionExecutor, make_action
 
 
 class ScriptRunner:
-    def __init__(self, cooldown: float = 5.0):
+    """Fires enter/leave actions, at most once per `cooldown` each, on an ActionExecutor."""
+
+    def __init__(self, cooldown: float = 5.0, on_fire: Callable[[str], None] = lambda _: None,
+                 executor: ActionExecutor | None = None, camera: str = "default"):
         self.cooldown = cooldown
+        self._on_fire = on_fire
+        self.executor = executor if executor is not None else ActionExecutor(name=camera)
+        self.camera = camera
+        self._actions: dict[str, Action] = {}
         self._last_fired: dict[str, float] = {}
         self.total_fires: int = 0
         self.last_fired_path: str | None = None
         self.last_fired_time: float = 0.0
 
-    def run(self, script_path: str) -> bool:
-        """Run an AppleScript. Returns True if fired, False if on cooldown."""
+    def run(self, script_path: str, event: str = "") -> bool:
+        """Queue the action for `script_path`. Returns True if fired, False if on cooldown or dropped."""
         if not script_path:
             return False
         now = time.time()
         last = self._last_fired.get(script_path, 0.0)
         if now - last < self.cooldown:
             return False
+        action = self._actions.get(script_path)
+        if action is None:
+            action = self._actions[script_path] = make_action(script_path)
+        if not self.executor.submit(action, {"event": event, "camera": self.camera, "ts": now}):
+            return False
         self._last_fired[script_path] = now
         self.last_fired_path = script_path
         self.last_fired_time = now
         self.total_fires += 1
-        subprocess.Popen(["osascript", script_path])
+        self._on_fire(script_path)
         return True
 
     def cooldown_remaining(self, script_path: str) -> float:
@@ -30,3 +44,6 @@ class ScriptRunner:
             return 0.0
         elapsed = time.time() - self._last_fired.get(script_path, 0.0)
         return max(0.0, self.cooldown - elapsed)
+
+    def close(self):
+        self.executor.close()
@@ -1,71 +1,107 @@
 import threading
 import time
 from collections import deque
+from itertools import islice
 
 import numpy as np
 
+from app.broadcast import FrameBroadcaster, VersionSignal
+from app.camera import StreamHealth
 from app.detector import Detection
 
+FRAME_META_KEPT = 64
+
 
 class AppState:
     def __init__(self):
         self._lock = threading.Lock()
+        # may be a reused overlay buffer: valid until the next update_frame()
         self.latest_annotated_frame: np.ndarray | None = None
+        self.frames = FrameBroadcaster()
         self.latest_detections: list[Detection] = []
         self.tracker_state: dict = {}
+        # (seq, detections, dog_inside, (width, height)) of recent frames, for dashboards
+        # that draw the overlay themselves
+        self._frame_meta: deque[tuple] = deque(maxlen=FRAME_META_KEPT)
         self.event_log: deque[str] = deque(maxlen=200)
+        self._event_seq = 0
+        # bumped on every frame/event so push clients wake only when something changed
+        self.updates = VersionSignal()
+        self._snapshot: tuple[int, dict] | None = None
         self.timings: dict = {
             "inference_ms": 0.0,
             "render_ms": 0.0,
             "camera_fps": 0.0,
             "inference_fps": 0.0,
+            "dropped_frames": 0,
         }
+        self.stream_health: StreamHealth | None = None
+        # detector readiness: the web UI is served while the model loads in the background
+        self.model: dict = {"status": "loading", "load_s": None, "error": ""}
         self.roi_points: list[tuple[int, int]] = []
         self.frame_count: int = 0
         self.inference_count: int = 0
         self.web_clients: int = 0
-        self._roi_updated: bool = False
+        self.server_overlay: bool = True  # False: the dashboard draws boxes and ROI itself
+        self._config_update = None
         self._trigger_enter: bool = False
         self._trigger_leave: bool = False
 
     def update_frame(self, frame: np.ndarray, detections: list[Detection],
-                     tracker_state: dict, inference_ms: float, render_ms: float):
+                     tracker_state: dict, inference_ms: float, render_ms: float, seq: int):
         with self._lock:
             self.latest_annotated_frame = frame
             self.latest_detections = detections
             self.tracker_state = tracker_state
             self.timings["inference_ms"] = inference_ms
             self.timings["render_ms"] = render_ms
+            self._frame_meta.append((seq, detections, tracker_state.get("dog_inside", False),
+                                     (frame.shape[1], frame.shape[0])))
+        self.frames.publish(frame, seq)
+        self.updates.bump()
+
+    def frame_meta_since(self, seq: int) -> list[dict]:
+        """Overlay metadata of the kept frames newer than `seq`, oldest first."""
+        with self._lock:
+            metas = [m for m in self._frame_meta if m[0] > seq]
+            roi = [list(p) for p in self.roi_points]
+        return [
+            {"seq": s, "size": size, "dog_inside": inside, "roi": roi,
+             "detections": [_detection_dict(d) for d in detections]}
+            for s, detections, inside, size in metas
+        ]
+
+    def set_model_status(self, status: str, **info):
+        with self._lock:
+            self.model = {**self.model, "status": status, **info}
+        self.updates.bump()
 
     def log_event(self, msg: str):
         with self._lock:
             ts = time.strftime("%H:%M:%S")
             self.event_log.appendleft(f"{ts} {msg}")
+            self._event_seq += 1
+        self.updates.bump()
 
-    def get_frame_jpeg(self) -> bytes | None:
-        import cv2
+    def events_since(self, seq: int) -> tuple[int, list[str]]:
+        """(latest event seq, events logged after `seq`, newest first)."""
         with self._lock:
-            if self.latest_annotated_frame is None:
-                return None
-            _, buf = cv2.imencode(".jpg", self.latest_annotated_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-            return buf.tobytes()
+            n = min(self._event_seq - seq, len(self.event_log))
+            return self._event_seq, list(islice(self.event_log, n))
 
-    def set_roi_from_web(self, points: list[tuple[int, int]]):
-        with self._lock:
-            self.roi_points = points
-            self._roi_updated = True
+    def get_frame_jpeg(self) -> bytes | None:
+        encoded = self.frames.jpeg()
+        return encoded[1] if encoded is not None else None
 
-    def clear_roi_from_web(self):
+    def set_config_update(self, config):
+        """Queue a new root Config for the pipeline to apply before its next frame."""
         with self._lock:
-            self.roi_points = []
-            self._roi_updated = True
+            self._config_update = config
 
-    def consume_roi_update(self) -> list[tuple[int, int]] | None:
+    def consume_config_update(self):
         with self._lock:
-            if self._roi_updated:
-                self._roi_updated = False
-                return list(self.roi_points)
-            return None
+            config, self._config_update = self._config_update, None
+            return config
 
     def set_trigger(self, event: str):
         with self._lock:
@@ -84,15 +120,54 @@ class AppState:
 
     def to_dict(self) -> dict:
         with self._lock:
-            return {
-                "tracker": dict(self.tracker_state),
-                "detections": [
-                    {"bbox": d.bbox, "center": d.center, "confidence": d.confidence, "in_roi": d.in_roi, "track_id": d.track_id}
-                    for d in self.latest_detections
-                ],
-                "event_log": list(self.event_log),
-                "timings": dict(self.timings),
-                "frame_count": self.frame_count,
-                "inference_count": self.inference_count,
-                "web_clients": self.web_clients,
-            }
+            return {**self._fields(), "event_log": list(self.event_log)}
+
+    def snapshot(self) -> dict:
+        """to_dict() without the event log, built at most once per update and shared by push clients."""
+        version = self.updates.version
+        cached = self._snapshot
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with self._lock:
+            snap = self._fields()
+        self._snapshot = (version, snap)
+        return snap
+
+    def _fields(self) -> dict:
+        return {
+            "tracker": dict(self.tracker_state),
+            "detections": [_detection_dict(d) for d in self.latest_detections],
+            "timings": dict(self.timings),
+            "model": dict(self.model),
+            "stream": self.stream_health.as_dict() if self.stream_health is not None else {},
+            "frame_count": self.frame_count,
+            "inference_count": self.inference_count,
+            "web_clients": self.web_clients,
+            "server_overlay": self.server_overlay,
+        }
+
+
+def _detection_dict(d: Detection) -> dict:
+    return {"bbox": d.bbox, "center": d.center, "confidence": d.confidence, "in_roi": d.in_roi, "track_id": d.track_id}
+
+
+def diff_state(old: dict, new: dict) -> dict:
+    """Fields of `new` that differ from `old`; nested dicts are diffed one level deep.
+
+    >>> diff_state({"a": 1, "t": {"x": 1, "y": 2}}, {"a": 1, "t": {"x": 1, "y": 3, "z": 0}})
+    {'t': {'y': 3, 'z': 0}}
+    >>> diff_state({"t": {"x": 1}}, {"t": {}})
+    {'t': {'x': None}}
+    """
+    out = {}
+    for key, value in new.items():
+        before = old.get(key)
+        if value == before:
+            continue
+        if isinstance(value, dict) and isinstance(before, dict):
+            sub = {k: v for k, v in value.items() if before.get(k) != v}
+            sub.update({k: None for k in before if k not in value})
+            out[key] = sub
+        else:
+            out[key] = value
+    return out
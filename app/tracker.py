@@ -97,8 +97,9 @@ class Tracker:
 
         # tag detections with in_roi via bbox overlap, collect IDs seen in ROI
         ids_in_roi: set[int] = set()
-        for d in detections:
-            d.in_roi = roi.bbox_overlap(*d.bbox) >= self.min_overlap
+        overlaps = roi.overlaps([d.bbox for d in detections])
+        for d, overlap in zip(detections, overlaps):
+            d.in_roi = bool(overlap >= self.min_overlap)
             if d.in_roi and d.track_id is not None:
                 ids_in_roi.add(d.track_id)
 
@@ -1,20 +1,39 @@
 import asyncio
+import json
+import secrets
 import time
+from dataclasses import asdict
 from pathlib import Path
 
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
-from app.state import AppState
+from app import metrics, profiling
+from app.history import EventStore
+from app.reload import ConfigReloader
+from app.state import AppState, diff_state
 
 STATIC_DIR = Path(__file__).parent / "static"
+SSE_KEEPALIVE_S = 15.0
+SSE_STATS_INTERVAL_S = 1.0
+SSE_STATS_FIELDS = ("timings", "stream", "frame_count", "inference_count")  # change on every frame
+MAX_STREAM_WIDTH = 3840
+FRAME_WAIT_S = 10.0
+MAX_PROFILE_S = 120.0
+MAX_TRACE_FRAMES = 10_000
+LOCAL_HOSTS = ("127.0.0.1", "::1")
+PROXY_HEADERS = ("x-forwarded-for", "cf-connecting-ip", "forwarded")
 
 app = FastAPI(title="Dog Detector")
 
 
 _state: AppState | None = None
+_camera_states: dict[str, AppState] = {}
+_history: EventStore | None = None
+_reloader: ConfigReloader | None = None
+_profiling = False
 
 
 def set_state(state: AppState):
@@ -22,6 +41,50 @@ def set_state(state: AppState):
     _state = state
 
 
+def set_camera_states(states: dict[str, AppState]):
+    global _camera_states
+    _camera_states = states
+
+
+def set_history(history: EventStore):
+    global _history
+    _history = history
+
+
+def set_config_reloader(reloader: ConfigReloader):
+    global _reloader
+    _reloader = reloader
+
+
+def _history_or_404() -> EventStore:
+    if _history is None:
+        raise HTTPException(status_code=404, detail="history is disabled")
+    return _history
+
+
+def _check_token(request: Request):
+    """Allow a write or admin request: it must carry the configured web_token, or come
+    straight from this machine when none is set (a local tunnel adds forwarding headers).
+    """
+    token = _reloader.config.web_token if _reloader is not None else ""
+    if token:
+        if not secrets.compare_digest(request.headers.get("x-token", ""), token):
+            raise HTTPException(status_code=401, detail="missing or wrong X-Token")
+        return
+    local = request.client is not None and request.client.host in LOCAL_HOSTS
+    if not local or any(h in request.headers for h in PROXY_HEADERS):
+        raise HTTPException(status_code=403, detail="set web_token in the config file to allow this remotely")
+
+
+def _state_for(camera: str | None) -> AppState | None:
+    """State for a named camera, or the default state for the un-prefixed routes."""
+    if camera is None:
+        return _state
+    if camera not in _camera_states:
+        raise HTTPException(status_code=404, detail=f"unknown camera: {camera}")
+    return _camera_states[camera]
+
+
 class ROIRequest(BaseModel):
     points: list[list[int]]
 
@@ -31,63 +94,293 @@ class TriggerRequest(BaseModel):
 
 
 @app.get("/stream")
-async def stream():
+@app.get("/cam/{camera}/stream")
+async def stream(camera: str | None = None,
+                 width: int = Query(0, ge=0, le=MAX_STREAM_WIDTH, description="max width; 0 = full size"),
+                 fps: float = Query(0, ge=0, le=60, description="frame rate cap; 0 = every frame"),
+                 quality: int = Query(0, ge=0, le=100, description="JPEG quality; 0 = server default")):
+    _state_for(camera)
+
+    send_ms = metrics.histogram("stream_send_ms", "Time for a client to accept one MJPEG part")
+    skipped = metrics.counter("stream_frames_skipped_total",
+                              "Frames a stream client never received (fps cap, slow socket or dropped upstream)")
+    interval = 1.0 / fps if fps else 0.0
+    quality = max(10, quality) if quality else 0
+
     async def generate():
+        version = 0
+        last_sent = 0.0
         while True:
-            if _state is None:
+            state = _state_for(camera)
+            if state is None:
                 await asyncio.sleep(0.1)
                 continue
-            jpeg = _state.get_frame_jpeg()
-            if jpeg is None:
-                await asyncio.sleep(0.1)
+            if interval:
+                await asyncio.sleep(max(0.0, last_sent + interval - time.monotonic()))
+            # always the newest frame: anything published while this client was capped or
+            # still writing the last part is skipped, never queued. Encoded once per frame
+            # and profile, shared by every client asking for the same size and quality.
+            encoded = await state.frames.next_jpeg(version, width, quality)
+            if encoded is None:
                 continue
+            if version:
+                skipped.inc(max(0, encoded[0] - version - 1))
+            version, jpeg = encoded
+            last_sent = t0 = time.monotonic()
             yield (
                 b"--frame\r\n"
                 b"Content-Type: image/jpeg\r\n\r\n"
                 + jpeg
                 + b"\r\n"
             )
-            await asyncio.sleep(0.05)  # ~20fps
+            # resumes only once the server has handed the part to the socket, which
+            # waits while the client's socket is backed up
+            send_ms.observe((time.monotonic() - t0) * 1000)
 
     return StreamingResponse(generate(), media_type="multipart/x-mixed-replace; boundary=frame")
 
 
+@app.get("/frame.jpg")
+@app.get("/cam/{camera}/frame.jpg")
+async def get_frame(camera: str | None = None, after: int = 0,
+                    width: int = Query(0, ge=0, le=MAX_STREAM_WIDTH), quality: int = Query(0, ge=0, le=100)):
+    """The next frame newer than `after`, with its sequence number in X-Frame-Seq.
+
+    Long-polls for up to FRAME_WAIT_S; 204 if no new frame arrived. Clients that draw
+    the overlay themselves pair the frame with /api/overlay/stream metadata by seq.
+    """
+    state = _state_for(camera)
+    if state is None:
+        raise HTTPException(status_code=503, detail="not ready")
+    try:
+        encoded = await asyncio.wait_for(state.frames.next_jpeg(after, width, max(10, quality) if quality else 0),
+                                         FRAME_WAIT_S)
+    except asyncio.TimeoutError:
+        encoded = None
+    if encoded is None:
+        return Response(status_code=204)
+    seq, jpeg = encoded
+    return Response(jpeg, media_type="image/jpeg", headers={"X-Frame-Seq": str(seq), "Cache-Control": "no-store"})
+
+
+@app.get("/api/cameras")
+async def get_cameras():
+    return {"cameras": list(_camera_states)}
+
+
 @app.get("/api/state")
-async def get_state():
-    if _state is None:
+@app.get("/cam/{camera}/api/state")
+async def get_state(camera: str | None = None):
+    state = _state_for(camera)
+    if state is None:
         return {}
-    return _state.to_dict()
+    return {**state.to_dict(), "metrics": metrics.REGISTRY.summary()}
+
+
+@app.get("/api/state/stream")
+@app.get("/cam/{camera}/api/state/stream")
+async def state_stream(camera: str | None = None):
+    """Server-Sent Events: full state first, then only what changed on each pipeline update.
+
+    Diff messages carry changed fields (nested dicts diffed one level deep) and the
+    new event log lines under "events", newest first. Counters and timings change on
+    every frame, so they are sent at most once per SSE_STATS_INTERVAL_S.
+    """
+    state = _state_for(camera)
+    if state is None:
+        raise HTTPException(status_code=503, detail="not ready")
+
+    async def generate():
+        state.web_clients += 1
+        try:
+            event_seq, log = state.events_since(0)
+            last = state.snapshot()
+            version = state.updates.version
+            stats_sent = time.monotonic()
+            yield f"data: {json.dumps({**last, 'event_log': log})}\n\n"
+            while True:
+                try:
+                    version = await asyncio.wait_for(state.updates.wait_newer(version), SSE_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                snap = state.snapshot()
+                now = time.monotonic()
+                if now - stats_sent < SSE_STATS_INTERVAL_S:
+                    snap = {**snap, **{k: last[k] for k in SSE_STATS_FIELDS}}
+                else:
+                    stats_sent = now
+                diff = diff_state(last, snap)
+                last = snap
+                event_seq, events = state.events_since(event_seq)
+                if events:
+                    diff["events"] = events
+                if diff:
+                    yield f"data: {json.dumps(diff)}\n\n"
+        finally:
+            state.web_clients -= 1
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/overlay/stream")
+@app.get("/cam/{camera}/api/overlay/stream")
+async def overlay_stream(camera: str | None = None):
+    """Server-Sent Events: one message per published frame: seq, detections, ROI, dog_inside and frame size.
+
+    Frames published while a client was still reading are sent in order on its next
+    wake, as long as they are among the last FRAME_META_KEPT.
+    """
+    state = _state_for(camera)
+    if state is None:
+        raise HTTPException(status_code=503, detail="not ready")
+
+    async def generate():
+        seq = 0
+        while True:
+            try:
+                await asyncio.wait_for(state.frames.signal.wait_newer(seq), SSE_KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            metas = state.frame_meta_since(seq)
+            if not metas:
+                seq = state.frames.signal.version
+                continue
+            seq = metas[-1]["seq"]
+            yield "".join(f"data: {json.dumps(m)}\n\n" for m in metas)
+
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/admin/profile", response_class=PlainTextResponse)
+async def get_profile(request: Request, seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_S),
+                      interval_ms: float = Query(5.0, ge=1, le=1000),
+                      threads: str = Query("", description="comma-separated thread name prefixes; empty = all")):
+    """Sample every thread's stack (capture, inference, the event loop...) for `seconds`.
+
+    Returns collapsed stacks for flamegraph.pl or speedscope. One profile runs at a time.
+    """
+    global _profiling
+    _check_token(request)
+    if _profiling:
+        raise HTTPException(status_code=409, detail="a profile is already running")
+    _profiling = True
+    try:
+        prefixes = tuple(t for t in threads.split(",") if t)
+        folded = await asyncio.to_thread(profiling.sample_stacks, seconds, interval_ms / 1000, prefixes)
+    finally:
+        _profiling = False
+    return PlainTextResponse(folded, headers={"Content-Disposition": 'attachment; filename="profile.folded"'})
+
+
+@app.post("/api/admin/trace")
+async def set_trace(request: Request, frames: int = Query(..., ge=0, le=MAX_TRACE_FRAMES)):
+    """Record per-frame stage timings for the last `frames` frames; 0 turns tracing off."""
+    _check_token(request)
+    profiling.TRACER.enable(frames)
+    return {"frames": frames}
+
+
+@app.get("/api/admin/trace")
+async def get_trace(request: Request):
+    """The recorded frame stages as Chrome trace JSON (chrome://tracing or ui.perfetto.dev)."""
+    _check_token(request)
+    trace = await asyncio.to_thread(profiling.TRACER.chrome_trace)
+    return JSONResponse(trace, headers={"Content-Disposition": 'attachment; filename="frames.trace.json"'})
+
+
+@app.get("/api/events")
+@app.get("/cam/{camera}/api/events")
+async def get_events(camera: str | None = None, kind: str | None = None, before: int | None = None,
+                     since: float | None = None, until: float | None = None, limit: int = 50):
+    """Stored events, newest first; request the next page with before=<next_before>."""
+    if camera is not None:
+        _state_for(camera)
+    history = _history_or_404()
+    return await asyncio.to_thread(history.events, camera, kind, before, since, until, limit)
+
+
+@app.get("/api/stats")
+@app.get("/cam/{camera}/api/stats")
+async def get_stats(camera: str | None = None, days: int = 7):
+    if camera is not None:
+        _state_for(camera)
+    history = _history_or_404()
+    return await asyncio.to_thread(history.stats, camera, days)
 
 
 @app.get("/api/config")
-async def get_config():
-    if _state is None:
+@app.get("/cam/{camera}/api/config")
+async def get_config(camera: str | None = None):
+    state = _state_for(camera)
+    if state is None:
         return {}
-    return {"roi_points": _state.roi_points}
+    out = {"roi_points": state.roi_points}
+    if _reloader is not None:
+        out["config"] = {**asdict(_reloader.config.for_camera(camera)), "web_token": ""}
+    return out
+
+
+@app.post("/api/config")
+@app.post("/cam/{camera}/api/config")
+async def update_config(changes: dict, request: Request, camera: str | None = None):
+    """Change config fields; live fields apply from the next frame, the rest after a restart.
+
+    Fields in FILE_ONLY_FIELDS (scripts, paths, the model) are rejected.
+    """
+    _check_token(request)
+    _state_for(camera)
+    if _reloader is None:
+        raise HTTPException(status_code=503, detail="not ready")
+    try:
+        return {"ok": True, **await asyncio.to_thread(_reloader.update, camera, changes)}
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/api/roi")
-async def set_roi(req: ROIRequest):
-    if _state is None:
-        return {"error": "not ready"}
-    _state.set_roi_from_web([tuple(p) for p in req.points])
-    return {"ok": True}
+@app.post("/cam/{camera}/api/roi")
+async def set_roi(req: ROIRequest, request: Request, camera: str | None = None):
+    _check_token(request)
+    return await _save_roi(camera, req.points)
 
 
 @app.post("/api/roi/clear")
-async def clear_roi():
-    if _state is None:
+@app.post("/cam/{camera}/api/roi/clear")
+async def clear_roi(request: Request, camera: str | None = None):
+    _check_token(request)
+    return await _save_roi(camera, [])
+
+
+async def _save_roi(camera: str | None, points: list[list[int]]) -> dict:
+    """Save an ROI through the reloader, like any config edit; pipelines apply it from the next frame."""
+    if _state_for(camera) is None or _reloader is None:
         return {"error": "not ready"}
-    _state.clear_roi_from_web()
+    if camera is None and _camera_states:
+        camera = next(iter(_camera_states))  # the un-prefixed routes act on the first camera
+    try:
+        await asyncio.to_thread(_reloader.update, camera, {"roi_points": points})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {"ok": True}
 
 
 @app.post("/api/trigger")
-async def trigger(req: TriggerRequest):
-    if _state is None:
+@app.post("/cam/{camera}/api/trigger")
+async def trigger(req: TriggerRequest, request: Request, camera: str | None = None):
+    """Fire the enter/leave action by hand; the action itself only ever comes from the config file."""
+    _check_token(request)
+    state = _state_for(camera)
+    if state is None:
         return {"error": "not ready"}
-    _state.set_trigger(req.event)
-    _state.log_event(f"WEB TRIGGER: {req.event}")
+    state.set_trigger(req.event)
+    state.log_event(f"WEB TRIGGER: {req.event}")
     return {"ok": True}
 
 